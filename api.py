@@ -1,18 +1,57 @@
 """
 Telepathy REST API - FastAPI Backend for Voice Emotion Recognition
+
+Startup (TELEPATHY_STARTUP):
+    background  the server accepts connections at once; librosa, the model
+                runtime and the model load on the model thread, followed by
+                a warm-up pass. `/health` reports `loading` until then and
+                predictions return 503 (default)
+    blocking    the startup event waits for the same steps, as before
+
+Long recordings: `/predict/timeline` classifies overlapping windows of the
+whole file (see timeline.py) instead of its first DURATION seconds.
+
+Streaming: `/ws/stream` takes live PCM over a WebSocket and answers with the
+probabilities of the latest window every hop (see streaming.py).
+
+Bulk jobs: `/predict/batch` takes many files or zip / tar archives in one
+request and streams one NDJSON line per file as results complete.
+
+Profiling: with TELEPATHY_PROFILE_RATE or TELEPATHY_PROFILE_TOKEN set, a
+sample of `/predict` calls is run under cProfile (see profiling.py).
+
+Monitoring: `/metrics` serves request counts, errors, engine load and
+histograms of every pipeline stage, upload size and audio duration in the
+Prometheus text format (see metrics.py); `/stats` shows the same as JSON.
+
+Model versions: with a registry (see registry.py) the API serves the versions
+its routing.json names, optionally sending a share of requests to a candidate
+version. Changes are picked up every TELEPATHY_REGISTRY_POLL_S seconds, or at
+once on `POST /admin/reload` (header `X-Telepathy-Admin: <TELEPATHY_ADMIN_TOKEN>`,
+this worker only); new versions load and warm up while the current ones keep
+serving. Every prediction names its version in `X-Model-Version`.
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Header, UploadFile, HTTPException, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import numpy as np
-import librosa
-import tensorflow as tf
-import joblib
-import io
+import asyncio
+import hmac
+import importlib
+import json
 import os
+import time
+from contextlib import AsyncExitStack
 from datetime import datetime
 from pydantic import BaseModel
+from backends import RUNTIME_MODULES, load_backend, resolve_backend
+from engine import InferenceEngine, EngineSaturated, StageTimer
+from batching import MicroBatcher
+from result_cache import ResultCache, result_key
+from profiling import PROFILE_HEADER, RequestProfiler, profile_call
+from registry import REGISTRY_DIR, Router, load_version, read_manifest, read_routing, routing_path, uses_registry
+import metrics
 
 # Initialize FastAPI
 app = FastAPI(
@@ -30,12 +69,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variables
-model = None
-scaler = None
-label_encoder = None
-SAMPLE_RATE = 44100
-DURATION = 5
+class RequestMetrics:
+    """Count and time every HTTP request by route and status (plain ASGI, no extra task per request)"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.route_paths = None
+        self.in_flight = metrics.gauge("http_in_flight", "HTTP requests being handled")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.route_paths is None:
+            self.route_paths = {route.path for route in app.routes}
+        route = scope["path"] if scope["path"] in self.route_paths else "other"  # bounded label values
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        start = time.perf_counter()
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.in_flight.dec()
+            metrics.counter("http_requests", "HTTP requests by route and status",
+                            labels={"route": route, "status": status}).inc()
+            metrics.histogram("http_request_ms", "HTTP request duration by route (ms)",
+                              labels={"route": route}).observe((time.perf_counter() - start) * 1000)
+
+app.add_middleware(RequestMetrics)
+
+# Label returned when silence gating (see vad.py) leaves no speech
+NO_SPEECH = "no_speech"
+
+# Global variables: the active model, and the router that picks each request's model
+backend = None
+feature_cfg = None
+router = None
+
+# Model registry (see registry.py for TELEPATHY_MODEL_REGISTRY)
+REGISTRY_POLL_S = float(os.environ.get("TELEPATHY_REGISTRY_POLL_S", 10))  # 0: reload only on request
+ADMIN_TOKEN = os.environ.get("TELEPATHY_ADMIN_TOKEN", "")                 # unset: /admin/reload disabled
+ADMIN_HEADER = "X-Telepathy-Admin"
+reload_lock = asyncio.Lock()
+reload_error = None
+last_reload = None
+watcher_task = None
+
+# Startup state: "loading" -> "ready" or "failed"
+STARTUP_MODE = os.environ.get("TELEPATHY_STARTUP", "background")  # "background" or "blocking"
+startup_status = "loading"
+startup_error = None
+startup_timer = StageTimer()
+loader_task = None
+
+# Results of recent uploads (see result_cache.py for TELEPATHY_RESULT_CACHE_*)
+result_cache = ResultCache()
+
+# Sampled cProfile captures of /predict (see profiling.py for TELEPATHY_PROFILE_*)
+profiler = RequestProfiler()
+
+# Execution engine (see engine.py for TELEPATHY_EXECUTOR / _WORKERS / _QUEUE_SIZE)
+engine = InferenceEngine()
 
 # Models
 class PredictionResult(BaseModel):
@@ -43,70 +143,447 @@ class PredictionResult(BaseModel):
     confidence: float
     all_probabilities: dict
     timestamp: str
+    speech_detected: bool = True
+    skipped_seconds: float = 0.0
+
+class TimelineSegment(BaseModel):
+    start: float
+    end: float
+    emotion: str
+    confidence: float
+    all_probabilities: dict
+    speech_detected: bool = True
+    skipped_seconds: float = 0.0
+
+class TimelineResult(BaseModel):
+    duration: float
+    segments: list[TimelineSegment]
+    aggregate: dict
+    timestamp: str
 
 class HealthCheck(BaseModel):
     status: str
     model_loaded: bool
     supported_emotions: list
+    startup_ms: dict
 
-# Startup event
-@app.on_event("startup")
-async def load_models():
-    """Load ML models on startup"""
-    global model, scaler, label_encoder
+def warm_up(loaded, timer):
+    """Check a loaded model's feature config, then run it once so no request pays for first calls"""
+    from features import NUM_FEATURES, check_feature_config, extract_features
+    
+    # Refuse to serve a model whose features this build would compute differently
+    with timer.stage("check_config"):
+        check_feature_config(loaded.feature_config)
+    
+    # First calls compile librosa kernels and trace the model graph
+    with timer.stage("warmup_features"):
+        sample_rate = loaded.feature_config["sample_rate"]
+        noise = np.random.default_rng(0).normal(scale=0.01, size=sample_rate).astype(np.float32)
+        extract_features(noise, sample_rate, tonnetz_mode=loaded.feature_config["tonnetz_mode"])
+    with timer.stage("warmup_model"):
+        dummy = np.zeros((loaded.time_steps, NUM_FEATURES), dtype=np.float32)
+        for batch_size in sorted({1, batcher.max_batch_size}):
+            loaded.predict([dummy] * batch_size, StageTimer())
+    return loaded
+
+def load_routed(routing, loaded=None):
+    """
+    `{version: backend}` of every version `routing` names, warmed up
+    
+    Versions already in `loaded` are reused (published versions never change).
+    """
+    models = {}
+    for name in (routing["active"], routing["candidate"]):
+        if name is not None and name not in models:
+            models[name] = (loaded or {}).get(name) or warm_up(load_version(name), StageTimer())
+    return models
+
+def build_router(routing, models):
+    candidate = routing["candidate"]
+    return Router((routing["active"], models[routing["active"]]),
+                  (candidate, models[candidate]) if candidate else None, routing["candidate_percent"])
+
+def serve(new_router):
+    """Send every request from now on to `new_router`'s models (no await in between, so all at once)"""
+    global router, backend, feature_cfg
+    router = new_router
+    backend = new_router.active[1]
+    feature_cfg = backend.feature_config
+
+def load_and_warm_up():
+    """Import, load and warm up everything prediction needs (runs on the model thread)"""
+    # librosa and its numba-compiled helpers
+    with startup_timer.stage("import_features"):
+        import features  # noqa: F401
+    
+    # The registry's routed versions if there is one (see registry.py), else the
+    # exported model if present, else the original files (see backends.py)
+    routing = read_routing() if uses_registry() else None
+    kind = read_manifest(routing["active"])["backend"] if routing else resolve_backend()
+    if RUNTIME_MODULES[kind]:
+        with startup_timer.stage("import_runtime"):
+            importlib.import_module(RUNTIME_MODULES[kind])
+    with startup_timer.stage("load_model"):
+        loaded = load_version(routing["active"]) if routing else load_backend(kind)
+    warm_up(loaded, startup_timer)
+    
+    if routing is None:
+        routing = {"active": loaded.version, "candidate": None, "candidate_percent": 0.0}
+    serve(build_router(routing, load_routed(routing, {routing["active"]: loaded})))
+
+async def reload_models():
+    """
+    Serve the versions routing.json names now; True when that changed anything
+    
+    New versions load and warm up on a thread of their own while the current
+    ones keep serving; requests already running finish on the model they started with.
+    """
+    global reload_error, last_reload
+    async with reload_lock:
+        try:
+            routing = read_routing()
+            if routing == router.status():
+                return False
+            loop = asyncio.get_running_loop()
+            models = await loop.run_in_executor(None, load_routed, routing, router.loaded())
+        except Exception as e:
+            reload_error = f"{type(e).__name__}: {e}"
+            count_reload("failed")
+            raise
+        serve(build_router(routing, models))
+        reload_error, last_reload = None, datetime.now().isoformat()
+        count_reload("ok")
+        print(f"🔄 Serving model {routing['active']}"
+              + (f", {routing['candidate_percent']:g}% to candidate {routing['candidate']}" if routing["candidate"] else ""))
+        return True
+
+def routing_mtime():
+    try:
+        return os.stat(routing_path()).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+async def watch_registry():
+    """Reload whenever routing.json changes, checking every REGISTRY_POLL_S seconds"""
+    seen = routing_mtime()
+    while True:
+        await asyncio.sleep(REGISTRY_POLL_S)
+        if startup_status != "ready":
+            continue
+        mtime = routing_mtime()
+        if mtime is None or mtime == seen:
+            continue
+        seen = mtime
+        try:
+            await reload_models()
+        except Exception as e:
+            print(f"❌ Model reload failed, still serving {router.status()['active']}: {e}")
+
+async def load_in_background():
+    """Run `load_and_warm_up` and publish the result through /health"""
+    global startup_status, startup_error
     
+    start = time.perf_counter()
     try:
-        model = tf.keras.models.load_model("model_augmented.h5")
-        scaler = joblib.load("scaler.pkl")
-        label_encoder = joblib.load("label_encoder.pkl")
-        print("✅ Models loaded successfully!")
+        await engine.run_model(load_and_warm_up)
     except Exception as e:
+        startup_status, startup_error = "failed", f"{type(e).__name__}: {e}"
         print(f"❌ Error loading models: {e}")
-        raise
+        return
+    
+    startup_timer.timings["total"] = (time.perf_counter() - start) * 1000
+    startup_status = "ready"
+    print(f"✅ Models loaded successfully! ({backend.name} backend, version {router.active[0]})")
+    if router.candidate:
+        print(f"🧪 Candidate {router.candidate[0]} gets {router.candidate_percent:g}% of requests")
+    print(f"🎼 Tonnetz mode: {feature_cfg['tonnetz_mode']}")
+    print("⏱️  Startup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in startup_timer.timings.items()))
+
+# Startup event
+@app.on_event("startup")
+async def load_models():
+    """Start the engine and load ML models (in the background unless TELEPATHY_STARTUP=blocking)"""
+    global loader_task, watcher_task
+    
+    engine.start()
+    batcher.start()
+    if REGISTRY_POLL_S > 0:
+        watcher_task = asyncio.create_task(watch_registry())
+    print(f"⚙️  Engine: {engine.workers} {engine.kind} workers, queue size {engine.queue_size}")
+    print(f"📦 Micro-batching: up to {batcher.max_batch_size} items, "
+          f"{batcher.max_wait * 1000:g} ms max wait")
+    if profiler.enabled:
+        print(f"🔬 Profiling {profiler.rate:.1%} of /predict calls"
+              f"{' and requests with ' + PROFILE_HEADER if profiler.token else ''} into {profiler.directory}/")
+    
+    if STARTUP_MODE == "blocking":
+        await load_in_background()
+        if startup_status == "failed":
+            raise RuntimeError(startup_error)
+    else:
+        loader_task = asyncio.create_task(load_in_background())
+        print("⏳ Loading models in the background...")
+
+def require_ready():
+    """Reject requests until the model is loaded and warmed up"""
+    if startup_status == "failed":
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {startup_error}")
+    if startup_status != "ready":
+        raise HTTPException(status_code=503, detail="Model loading", headers={"Retry-After": "5"})
+
+@app.on_event("shutdown")
+async def stop_engine():
+    """Stop the batcher and registry watcher and release worker pools on shutdown"""
+    global watcher_task
+    if watcher_task is not None:
+        watcher_task.cancel()
+        watcher_task = None
+    await batcher.stop()
+    engine.shutdown()
 
 # Helper functions
-def extract_features(audio, sr):
-    """Extract audio features"""
-    mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-    stft = np.abs(librosa.stft(audio))
-    chroma = librosa.feature.chroma_stft(S=stft, sr=sr)
-    spec_contrast = librosa.feature.spectral_contrast(S=stft, sr=sr)
-    tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(audio), sr=sr)
-    
-    features = np.vstack([mfccs, chroma, spec_contrast, tonnetz]).T
-    return features
-
-def predict_emotion(audio):
-    """Predict emotion from audio"""
-    # Extract features
-    features = extract_features(audio, SAMPLE_RATE)
-    
-    # Pad or truncate
-    time_steps = model.input_shape[1]
-    if features.shape[0] < time_steps:
-        features = np.pad(features, ((0, time_steps - features.shape[0]), (0,0)), mode='constant')
-    elif features.shape[0] > time_steps:
-        features = features[:time_steps, :]
-    
-    # Scale features
-    features_2d = features.reshape(1, -1)
-    features_scaled_2d = scaler.transform(features_2d)
-    features_scaled = features_scaled_2d.reshape(1, time_steps, features.shape[1])
-    
-    # Make prediction
-    pred_probs = model.predict(features_scaled, verbose=0)
-    pred_index = np.argmax(pred_probs)
-    pred_label = label_encoder.inverse_transform([pred_index])[0]
-    confidence = float(pred_probs[0][pred_index])
+def featurize_upload(contents, config):
+    """
+    Decode, gate and featurize an upload (runs on the engine's worker pool)
+
+    Returns `(features, timings, skipped_seconds, audio_seconds)`; features
+    are None when silence gating left no speech. `timings` includes the
+    feature steps (stft, mfcc, chroma, contrast, tonnetz).
+    """
+    from features import featurize_bytes
+    timer = StageTimer()
+    features, seconds, skipped = featurize_bytes(contents, config, timer)
+    return features, timer.timings, skipped, seconds
+
+def no_speech_result(skipped):
+    """Result of an upload that silence gating left without speech"""
+    return {
+        "emotion": NO_SPEECH,
+        "confidence": 0.0,
+        "all_probabilities": {},
+        "speech_detected": False,
+        "skipped_seconds": round(skipped, 3)
+    }
+
+def predict_batch(model, feature_list):
+    """Classify several feature matrices in one forward pass"""
+    timer = StageTimer()
+    pred_probs = model.predict(feature_list, timer)
+    return [(probs, timer.timings) for probs in pred_probs]
+
+def predict_items(items):
+    """Classify a micro-batch of `(model, features)` items, one forward pass per model"""
+    groups = {}
+    for index, (model, _) in enumerate(items):
+        groups.setdefault(id(model), (model, []))[1].append(index)
+    results = [None] * len(items)
+    for model, indices in groups.values():
+        for index, result in zip(indices, predict_batch(model, [items[i][1] for i in indices])):
+            results[index] = result
+    return results
+
+def decode_prediction(probs, class_names):
+    """Turn a probability vector into (label, confidence, all probabilities)"""
+    pred_index = int(np.argmax(probs))
+    pred_label = class_names[pred_index]
+    confidence = float(probs[pred_index])
     
     # All probabilities
     all_probs = {
         emotion: float(prob) 
-        for emotion, prob in zip(label_encoder.classes_, pred_probs[0])
+        for emotion, prob in zip(class_names, probs)
     }
     
     return pred_label, confidence, all_probs
 
+def open_stream(sample_rate, config):
+    """Feature stream for one connection, plus a resampler to the feature sample rate"""
+    import soxr
+    from streaming import StreamingFeatures
+    stream = StreamingFeatures(config["sample_rate"], config["duration"],
+                               tonnetz_mode=config["tonnetz_mode"])
+    resampler = None
+    if sample_rate != config["sample_rate"]:
+        resampler = soxr.ResampleStream(sample_rate, config["sample_rate"], 1, dtype="float32")
+    return stream, resampler
+
+def push_stream(stream, resampler, samples):
+    """Resample and featurize one chunk of a stream (runs on the worker pool)"""
+    if resampler is not None:
+        samples = resampler.resample_chunk(samples)
+    return stream.push(samples)
+
+def cached_result(model, contents):
+    """`(key, cached result or None)` of an upload under `model`"""
+    key = result_key(contents, model.version, model.feature_config)
+    return key, result_cache.get(key)
+
+async def run_model_batch(items):
+    """Run one micro-batch of `(model, features)` items on the engine's model thread"""
+    return await engine.run_model(predict_items, items)
+
+# Decode time of every upload (see audio_io.py), in /stats
+decode_time = metrics.histogram("decode_ms", "Time to decode an upload to mono float32 (ms)")
+
+# Hot-path metrics, served on /metrics
+upload_size = metrics.histogram("upload_bytes", "Size of each uploaded file (bytes)", metrics.PAYLOAD_BUCKETS_BYTES)
+audio_duration = metrics.histogram("audio_seconds", "Decoded audio per upload before silence gating (s)",
+                                   metrics.AUDIO_BUCKETS_S)
+metrics.gauge("model_ready", "1 once the model is loaded and warmed up", fn=lambda: int(startup_status == "ready"))
+metrics.gauge("engine_in_flight", "Requests admitted by the engine", fn=lambda: engine.in_flight)
+metrics.gauge("engine_queue_depth", "Admitted requests beyond the worker count", fn=lambda: engine.queue_depth)
+metrics.gauge("engine_capacity", "Requests the engine admits before returning 429", fn=lambda: engine.capacity)
+metrics.counter("result_cache_hits", "Uploads answered from the result cache", fn=lambda: result_cache.hits)
+metrics.counter("result_cache_misses", "Result cache lookups that missed", fn=lambda: result_cache.misses)
+metrics.gauge("model_candidate_percent", "Share of requests routed to the candidate model version (%)",
+              fn=lambda: router.candidate_percent if router else 0)
+
+def observe_stages(timings):
+    """Record per-stage timings (ms) of one prediction"""
+    for stage, ms in timings.items():
+        metrics.histogram("stage_ms", "Time spent in each pipeline stage (ms)", labels={"stage": stage}).observe(ms)
+
+def observe_upload(contents, timings, seconds):
+    """Record size, audio duration and stage timings of one decoded upload"""
+    upload_size.observe(len(contents))
+    audio_duration.observe(seconds)
+    decode_time.observe(timings["decode"])
+
+def count_error(route, reason):
+    metrics.counter("errors", "Failed predictions by route and cause", labels={"route": route, "reason": reason}).inc()
+
+def observe_model(name, start, emotion):
+    """Record latency and predicted emotion of one uncached prediction by model version (for A/B comparisons)"""
+    metrics.histogram("model_request_ms", "Uncached /predict time by model version (ms)",
+                      labels={"version": name}).observe((time.perf_counter() - start) * 1000)
+    metrics.counter("model_predictions", "Predictions by model version and emotion",
+                    labels={"version": name, "emotion": emotion}).inc()
+
+def count_reload(result):
+    metrics.counter("model_reloads", "Model registry reloads by result", labels={"result": result}).inc()
+
+# Micro-batching stage (see batching.py for TELEPATHY_MAX_BATCH_SIZE / _MAX_BATCH_WAIT_MS)
+batcher = MicroBatcher(run_model_batch)
+
+# /predict/batch: files featurized at once per request, and files per model pass
+# (see bulk.py for TELEPATHY_BATCH_MAX_FILES / _MAX_FILE_MB)
+BULK_PARALLELISM = int(os.environ.get("TELEPATHY_BATCH_PARALLELISM", 0)) or 2 * engine.workers
+BULK_MODEL_BATCH = int(os.environ.get("TELEPATHY_BATCH_MODEL_SIZE", 32))
+
+async def featurize_bulk_file(model, name, contents):
+    """
+    `(line, cache key, features)` of one file of a bulk upload; never raises
+    
+    `line` is the file's NDJSON result, final unless features still need
+    the model.
+    """
+    try:
+        if isinstance(contents, Exception):
+            raise contents
+        key, result = None, None
+        if result_cache.enabled:
+            key, result = await engine.run_local(cached_result, model, contents)
+        if result is not None:
+            return {"file": name, **result, "cached": True}, None, None
+        features, stage_timings, skipped, seconds = await engine.run(featurize_upload, contents,
+                                                                     model.feature_config)
+        observe_upload(contents, stage_timings, seconds)
+        observe_stages(stage_timings)
+        line = {"file": name, **no_speech_result(skipped), "cached": False}
+        if features is None and key is not None:
+            await engine.run_local(result_cache.put, key, no_speech_result(skipped))
+        return line, key, features
+    except Exception as e:
+        count_error("/predict/batch", "file")
+        return {"file": name, "error": f"{type(e).__name__}: {e}"}, None, None
+
+async def predict_bulk_batch(model, pending):
+    """Run the model over featurized files; returns their finished NDJSON lines"""
+    timer = StageTimer()
+    try:
+        batch_probs = await engine.run_model(model.predict, [features for _, _, features in pending], timer)
+    except Exception as e:
+        count_error("/predict/batch", "model")
+        return [{"file": line["file"], "error": f"{type(e).__name__}: {e}"} for line, _, _ in pending]
+    
+    observe_stages(timer.timings)
+    for (line, key, _), probs in zip(pending, batch_probs):
+        emotion, confidence, all_probs = decode_prediction(probs, model.class_names)
+        line.update(emotion=emotion, confidence=confidence, all_probabilities=all_probs, speech_detected=True)
+        if key is not None:
+            result = {name: value for name, value in line.items() if name not in ("file", "cached")}
+            await engine.run_local(result_cache.put, key, result)
+    return [line for line, _, _ in pending]
+
+async def stream_bulk(files, model):
+    """
+    NDJSON lines of a bulk upload, in completion order, then a summary line
+    
+    Up to BULK_PARALLELISM files are decoded and featurized at a time; the
+    model runs whenever BULK_MODEL_BATCH featurized files are waiting, and
+    once more for the rest at the end. The admission slot is taken here, not
+    in the handler, so a response that is never streamed holds none; when the
+    engine filled up in between, the only line is an `error`.
+    """
+    from bulk import iter_uploads
+    admission = AsyncExitStack()
+    try:
+        await admission.enter_async_context(engine.admit())
+    except EngineSaturated as e:
+        count_error("/predict/batch", "busy")
+        yield json.dumps({"error": f"Server busy: {e}"}) + "\n"
+        return
+    start = time.perf_counter()
+    uploads = iter_uploads((upload.filename, upload.file) for upload in files)
+    summary = {"files": 0, "predicted": 0, "no_speech": 0, "cached": 0, "errors": 0}
+    running = set()
+    waiting = []  # (line, key, features) for the next model pass
+    exhausted = False
+    try:
+        async with admission:
+            while True:
+                # Keep the worker pool busy with the next files
+                while not exhausted and len(running) < BULK_PARALLELISM:
+                    item = await engine.run_local(next, uploads, None)
+                    if item is None:
+                        exhausted = True
+                    else:
+                        running.add(asyncio.ensure_future(featurize_bulk_file(model, *item)))
+                
+                lines = []
+                if running:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        line, key, features = task.result()
+                        if features is None:
+                            lines.append(line)
+                        else:
+                            waiting.append((line, key, features))
+                while len(waiting) >= BULK_MODEL_BATCH or (waiting and exhausted and not running):
+                    lines += await predict_bulk_batch(model, waiting[:BULK_MODEL_BATCH])
+                    del waiting[:BULK_MODEL_BATCH]
+                
+                for line in lines:
+                    summary["files"] += 1
+                    if "error" in line:
+                        summary["errors"] += 1
+                    elif line["cached"]:
+                        summary["cached"] += 1
+                    elif line["speech_detected"]:
+                        summary["predicted"] += 1
+                    else:
+                        summary["no_speech"] += 1
+                    yield json.dumps(line) + "\n"
+                if exhausted and not running and not waiting:
+                    break
+    finally:
+        for task in running:
+            task.cancel()
+    
+    elapsed = time.perf_counter() - start
+    summary.update(elapsed_s=round(elapsed, 3), files_per_s=round(summary["files"] / elapsed, 2) if elapsed else 0.0)
+    yield json.dumps({"summary": summary}) + "\n"
+
 # Routes
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -356,49 +833,328 @@ async def root():
 
 @app.get("/health", response_model=HealthCheck)
 async def health_check():
-    """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "model_loaded": model is not None,
-        "supported_emotions": list(label_encoder.classes_) if label_encoder else []
+    """Health check endpoint: `loading` or `ready` (200), `failed` (503)"""
+    content = {
+        "status": startup_status,
+        "model_loaded": startup_status == "ready",
+        "supported_emotions": list(backend.class_names) if backend else [],
+        "startup_ms": {name: round(ms, 1) for name, ms in startup_timer.timings.items()}
     }
+    if startup_status == "failed":
+        return JSONResponse(status_code=503, content={**content, "error": startup_error})
+    return content
 
 @app.post("/predict", response_model=PredictionResult)
-async def predict(file: UploadFile = File(...)):
+async def predict(response: Response, file: UploadFile = File(...),
+                  x_telepathy_profile: str = Header(None)):
     """
     Predict emotion from uploaded audio file
+    
+    Repeated uploads are answered from the result cache (`X-Cache: hit`).
+    A profiled request returns the id of its profile in `X-Profile-Id`.
     """
-    if not model:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    require_ready()
+    timer = StageTimer()
+    forced = profiler.forced(x_telepathy_profile)
+    name, model = router.pick()
+    response.headers["X-Model-Version"] = name
     
-    try:
-        # Read audio file
+    # Read audio file
+    with timer.stage("read"):
         contents = await file.read()
-        audio_data = io.BytesIO(contents)
-        
-        # Load audio with librosa
-        audio, sr = librosa.load(audio_data, sr=SAMPLE_RATE, duration=DURATION, mono=True)
-        
-        # Predict
-        emotion, confidence, all_probs = predict_emotion(audio)
+    
+    # Same bytes, same model: reuse the earlier result (unless a profile was asked for)
+    key, result = None, None
+    if result_cache.enabled and not forced:
+        with timer.stage("cache"):
+            key, result = await engine.run_local(cached_result, model, contents)
+    
+    if result is None:
+        start = time.perf_counter()
+        profiled = forced or profiler.sampled()
+        captured = []
+        try:
+            async with engine.admit():
+                # Decode, gate silence and extract features on the worker pool
+                if profiled:
+                    featurized, stats = await engine.run(profile_call, featurize_upload, contents,
+                                                         model.feature_config)
+                    captured.append(stats)
+                else:
+                    featurized = await engine.run(featurize_upload, contents, model.feature_config)
+                features, stage_timings, skipped, seconds = featurized
+                timer.update(stage_timings)
+                observe_upload(contents, stage_timings, seconds)
+                
+                # Predict as part of the next micro-batch, unless there is no speech
+                result = no_speech_result(skipped)
+                if features is not None:
+                    if profiled:
+                        # A model call of its own, so the profile holds only this request
+                        ((probs, batch_timings),), stats = await engine.run_model(
+                            profile_call, predict_batch, model, [features])
+                        captured.append(stats)
+                        wait_ms = 0.0
+                    else:
+                        (probs, batch_timings), wait_ms = await batcher.submit((model, features))
+                    timer.timings["batch_wait"] = wait_ms
+                    timer.update(batch_timings)
+                    emotion, confidence, all_probs = decode_prediction(probs, model.class_names)
+                    result.update(emotion=emotion, confidence=confidence, all_probabilities=all_probs,
+                                  speech_detected=True)
         
-        return {
-            "emotion": emotion,
-            "confidence": confidence,
-            "all_probabilities": all_probs,
-            "timestamp": datetime.now().isoformat()
-        }
+        except EngineSaturated as e:
+            count_error("/predict", "busy")
+            raise HTTPException(status_code=429, detail=f"Server busy: {e}", headers={"Retry-After": "1"})
+        except Exception as e:
+            count_error("/predict", "bad_audio")
+            raise HTTPException(status_code=400, detail=f"Error processing audio: {str(e)}")
         
+        observe_model(name, start, result["emotion"])
+        if key is not None:
+            await engine.run_local(result_cache.put, key, result)
+        if captured:
+            info = {"file": file.filename, "upload_bytes": len(contents), "forced": forced,
+                    "model": name, "model_version": model.version, "timings_ms": timer.timings, "result": result}
+            profile_id = await engine.run_local(profiler.save, captured, info)
+            if profile_id is not None:
+                response.headers["X-Profile-Id"] = profile_id
+        response.headers["X-Cache"] = "miss"
+    else:
+        response.headers["X-Cache"] = "hit"
+    
+    observe_stages(timer.timings)
+    response.headers["Server-Timing"] = timer.server_timing()
+    return {**result, "timestamp": datetime.now().isoformat()}
+
+@app.post("/predict/timeline", response_model=TimelineResult)
+async def predict_timeline(response: Response, file: UploadFile = File(...), hop: float = None):
+    """
+    Emotion timeline of a recording of any length
+    
+    The file is decoded in blocks and cut into windows of the model's clip
+    length every `hop` seconds (TELEPATHY_TIMELINE_HOP_S by default). Each
+    segment gets its own prediction; `aggregate` averages their probabilities.
+    Segments that silence gating leaves without speech are reported as such
+    and left out of the aggregate. `hop` must be at least
+    TELEPATHY_TIMELINE_MIN_HOP_S, and a recording that would need more than
+    TELEPATHY_TIMELINE_MAX_WINDOWS windows is rejected with 413.
+    """
+    require_ready()
+    from timeline import (HOP_SECONDS, MAX_WINDOWS, MIN_HOP_SECONDS, TooManyWindows, next_windows,
+                          open_timeline, window_features)
+    if hop is not None and hop < MIN_HOP_SECONDS:
+        raise HTTPException(status_code=422, detail=f"hop must be at least {MIN_HOP_SECONDS:g} seconds")
+    name, model = router.pick()
+    config = model.feature_config
+    
+    segments = []
+    segment_probs = []
+    timer = StageTimer()
+    timer.update({"decode": 0.0, "features": 0.0, "model": 0.0})
+    try:
+        async with engine.admit():
+            # The upload is spooled to disk; it is read block by block
+            windows = open_timeline(file.file, config, hop or HOP_SECONDS)
+            while True:
+                start = time.perf_counter()
+                batch = await engine.run_local(next_windows, windows)
+                timer.timings["decode"] += (time.perf_counter() - start) * 1000
+                if not batch:
+                    break
+                if len(segments) + len(batch) > MAX_WINDOWS:
+                    raise TooManyWindows(f"more than {MAX_WINDOWS} windows at a hop of {hop or HOP_SECONDS:g} s")
+                
+                # Features of every window in parallel, then one model pass per batch
+                start = time.perf_counter()
+                results = await asyncio.gather(*(engine.run(window_features, audio, config)
+                                                 for _, audio in batch))
+                timer.timings["features"] += (time.perf_counter() - start) * 1000
+                
+                feature_list = [features for features, _ in results if features is not None]
+                probs = iter([])
+                if feature_list:
+                    model_timer = StageTimer()
+                    probs = iter(await engine.run_model(model.predict, feature_list, model_timer))
+                    timer.timings["model"] += model_timer.timings["model"]
+                
+                for (offset, audio), (features, skipped) in zip(batch, results):
+                    segment = {
+                        "start": round(offset, 3),
+                        "end": round(offset + len(audio) / config["sample_rate"], 3),
+                        "emotion": NO_SPEECH,
+                        "confidence": 0.0,
+                        "all_probabilities": {},
+                        "speech_detected": features is not None,
+                        "skipped_seconds": round(skipped, 3)
+                    }
+                    if features is not None:
+                        window_probs = next(probs)
+                        segment["emotion"], segment["confidence"], segment["all_probabilities"] = \
+                            decode_prediction(window_probs, model.class_names)
+                        segment_probs.append(window_probs)
+                    segments.append(segment)
+    
+    except EngineSaturated as e:
+        count_error("/predict/timeline", "busy")
+        raise HTTPException(status_code=429, detail=f"Server busy: {e}", headers={"Retry-After": "1"})
+    except TooManyWindows as e:
+        count_error("/predict/timeline", "too_long")
+        raise HTTPException(status_code=413, detail=f"Recording too long: {e}; use a larger hop")
     except Exception as e:
+        count_error("/predict/timeline", "bad_audio")
         raise HTTPException(status_code=400, detail=f"Error processing audio: {str(e)}")
+    if not segments:
+        raise HTTPException(status_code=400, detail="Error processing audio: no audio in file")
+    
+    emotion, confidence, all_probs = NO_SPEECH, 0.0, {}
+    if segment_probs:
+        emotion, confidence, all_probs = decode_prediction(np.mean(segment_probs, axis=0), model.class_names)
+    observe_stages({f"timeline_{stage}": ms for stage, ms in timer.timings.items()})
+    response.headers["Server-Timing"] = timer.server_timing()
+    response.headers["X-Model-Version"] = name
+    return {
+        "duration": max(segment["end"] for segment in segments),
+        "segments": segments,
+        "aggregate": {"emotion": emotion, "confidence": confidence, "all_probabilities": all_probs},
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.post("/predict/batch")
+async def predict_bulk(files: list[UploadFile] = File(...)):
+    """
+    Predict emotion for many audio files, or zip / tar archives of them
+    
+    Streams `application/x-ndjson`: one line per file as soon as its result
+    is ready (`file`, then the /predict fields or `error`), and a final
+    `summary` line. A file that fails is reported on its line; the rest of
+    the batch carries on. The whole request holds one admission slot while
+    it streams.
+    """
+    require_ready()
+    if engine.saturated:
+        count_error("/predict/batch", "busy")
+        raise HTTPException(status_code=429, detail=f"Server busy: {engine.in_flight} requests in flight "
+                                                    f"(capacity {engine.capacity})", headers={"Retry-After": "1"})
+    name, model = router.pick()
+    return StreamingResponse(stream_bulk(files, model), media_type="application/x-ndjson",
+                             headers={"X-Model-Version": name})
+
+# Binary PCM formats accepted by /ws/stream (little-endian, mono)
+STREAM_FORMATS = {"s16": np.dtype("<i2"), "f32": np.dtype("<f4")}
+
+@app.websocket("/ws/stream")
+async def stream_predict(websocket: WebSocket, sample_rate: int = 16000, format: str = "s16"):
+    """
+    Live emotion over a sliding window.
+    
+    The client sends binary messages of mono PCM (`format` s16 or f32 at
+    `sample_rate`); every hop the server sends the probabilities of the
+    latest window as JSON. Features are updated incrementally, and each
+    window joins the /predict micro-batches.
+    """
+    await websocket.accept()
+    if startup_status != "ready":
+        await websocket.close(code=1013, reason="Model loading" if startup_status == "loading" else "Model failed to load")
+        return
+    if format not in STREAM_FORMATS or sample_rate <= 0:
+        await websocket.close(code=1003, reason=f"Unsupported stream: format={format}, sample_rate={sample_rate}")
+        return
+    dtype = STREAM_FORMATS[format]
+    name, model = router.pick()
+    
+    stream, resampler = await engine.run_local(open_stream, sample_rate, model.feature_config)
+    try:
+        while True:
+            chunk = await websocket.receive_bytes()
+            if len(chunk) % dtype.itemsize:
+                await websocket.close(code=1003, reason=f"Message length is not a multiple of {dtype.itemsize} bytes")
+                return
+            samples = np.frombuffer(chunk, dtype=dtype).astype(np.float32)
+            if format == "s16":
+                samples /= 32768.0
+            
+            try:
+                async with engine.admit():
+                    timer = StageTimer()
+                    with timer.stage("features"):
+                        windows = await engine.run_local(push_stream, stream, resampler, samples)
+                    results = await asyncio.gather(*(batcher.submit((model, features)) for _, features in windows))
+            except EngineSaturated as e:
+                count_error("/ws/stream", "busy")
+                # Dropping audio would leave a gap in the stream, so end it instead
+                await websocket.close(code=1013, reason=f"Server busy: {e}")
+                return
+            
+            for (seconds, _), ((probs, batch_timings), wait_ms) in zip(windows, results):
+                emotion, confidence, all_probs = decode_prediction(probs, model.class_names)
+                timings = {**timer.timings, "batch_wait": wait_ms, **batch_timings}
+                await websocket.send_json({
+                    "time": round(seconds, 3),
+                    "emotion": emotion,
+                    "confidence": confidence,
+                    "all_probabilities": all_probs,
+                    "model_version": name,
+                    "timings_ms": {name: round(ms, 1) for name, ms in timings.items()}
+                })
+    except WebSocketDisconnect:
+        pass
 
 @app.get("/api/emotions")
 async def get_emotions():
     """Get list of supported emotions"""
-    if not label_encoder:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    require_ready()
     
-    return {"emotions": list(label_encoder.classes_)}
+    return {"emotions": list(backend.class_names)}
+
+@app.get("/stats")
+async def get_stats():
+    """Serving statistics: engine load, result cache and histograms"""
+    return {
+        "engine": {
+            "in_flight": engine.in_flight,
+            "queue_depth": engine.queue_depth,
+            "capacity": engine.capacity
+        },
+        "result_cache": result_cache.stats(),
+        "profiling": profiler.stats(),
+        "models": {
+            **(router.status() if router else {}),
+            "loaded": {name: {"backend": model.name, "artifact_version": model.version}
+                       for name, model in (router.loaded() if router else {}).items()},
+            "registry": REGISTRY_DIR if uses_registry() else None,
+            "last_reload": last_reload,
+            "reload_error": reload_error
+        },
+        "histograms": metrics.snapshot()
+    }
+
+@app.post("/admin/reload")
+async def reload_registry(x_telepathy_admin: str = Header(None)):
+    """
+    Serve the versions the registry's routing.json names now
+    
+    Loads and warms up new versions while the current ones keep serving,
+    then swaps them in. Affects this worker only; the others follow within
+    TELEPATHY_REGISTRY_POLL_S seconds.
+    """
+    if not ADMIN_TOKEN or x_telepathy_admin is None or \
+            not hmac.compare_digest(x_telepathy_admin.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail=f"Requires {ADMIN_HEADER} with TELEPATHY_ADMIN_TOKEN")
+    require_ready()
+    if not uses_registry():
+        raise HTTPException(status_code=409, detail=f"No model registry at {routing_path()}")
+    try:
+        changed = await reload_models()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed, still serving the previous models: "
+                                                    f"{type(e).__name__}: {e}")
+    return {"reloaded": changed, **router.status()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Counters, gauges and histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,109 @@
+"""
+Telepathy audio decoding - uploaded bytes to a mono float32 waveform
+
+    sniff_format   container from the first bytes of the upload
+    read_audio     decode at most `duration` seconds, at the file's own rate
+    resample       to the model's sample rate with the feature config's res_type
+
+WAV, FLAC, OGG (Vorbis / Opus), MP3, AIFF and the other formats libsndfile
+knows are decoded in-process straight into float32, reading only the frames
+needed; mono files come back without any copy. AAC / M4A and WebM, or a file
+libsndfile rejects, go to an `ffmpeg` subprocess that is killed after
+TELEPATHY_DECODE_TIMEOUT_S, so a broken or hostile upload cannot hold a worker.
+The libsndfile path followed by `resample` gives the same samples as
+`librosa.load(..., sr, duration, res_type, mono=True)`.
+"""
+import io
+import os
+import shutil
+import subprocess
+
+import numpy as np
+
+# ==============================
+# CONFIG
+# ==============================
+DECODE_TIMEOUT_S = float(os.environ.get("TELEPATHY_DECODE_TIMEOUT_S", 10))
+FFMPEG = os.environ.get("TELEPATHY_FFMPEG", "ffmpeg")
+FFMPEG_FORMATS = ("mp4", "webm", "aac")  # containers libsndfile cannot read
+
+
+class DecodeError(Exception):
+    """Raised when an upload cannot be decoded"""
+
+
+def sniff_format(head):
+    """Container format from the first 12 bytes of a file, or None"""
+    if head[:4] in (b"RIFF", b"RF64") and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return "aac"  # ADTS: MPEG sync word with layer bits 00
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+
+def _read_soundfile(contents, duration):
+    import soundfile as sf
+
+    with sf.SoundFile(io.BytesIO(contents)) as f:
+        frames = f.frames if duration is None else min(f.frames, int(duration * f.samplerate))
+        audio = f.read(frames, dtype="float32")
+        sample_rate = f.samplerate
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    return audio, sample_rate
+
+
+def _read_ffmpeg(contents, duration, sample_rate, timeout=DECODE_TIMEOUT_S):
+    """Decode with ffmpeg at `sample_rate` (returns a read-only array)"""
+    command = [FFMPEG, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", "pipe:0"]
+    if duration is not None:
+        command += ["-t", str(duration)]
+    command += ["-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+    try:
+        result = subprocess.run(command, input=contents, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise DecodeError(f"Decoding timed out after {timeout:g} s")
+    if result.returncode != 0:
+        message = result.stderr.decode(errors="replace").strip().splitlines()
+        raise DecodeError(f"ffmpeg could not decode the audio: {message[-1] if message else result.returncode}")
+    return np.frombuffer(result.stdout, dtype=np.float32), sample_rate
+
+
+def read_audio(contents, duration=None, sample_rate=None):
+    """
+    Decode the first `duration` seconds of an audio file to mono float32.
+
+    Returns `(audio, rate)`: the file's own rate when libsndfile decodes it,
+    `sample_rate` when the ffmpeg fallback does (it resamples while decoding).
+    """
+    fmt = sniff_format(contents[:12])
+    if fmt not in FFMPEG_FORMATS:
+        try:
+            return _read_soundfile(contents, duration)
+        except RuntimeError:  # soundfile.LibsndfileError: e.g. an MP3 variant libsndfile lacks
+            pass
+    if shutil.which(FFMPEG) is None:
+        raise DecodeError(f"Unsupported audio format ({fmt or 'unknown'}); install ffmpeg to decode it")
+    if sample_rate is None:
+        raise DecodeError(f"A sample rate is needed to decode {fmt or 'unknown'} audio with ffmpeg")
+    return _read_ffmpeg(contents, duration, sample_rate)
+
+
+def resample(audio, sr, target_sr, res_type="soxr_hq"):
+    """Resample to `target_sr` (no-op when the rates match)"""
+    if sr == target_sr:
+        return audio
+    import librosa
+    return librosa.resample(audio, orig_sr=sr, target_sr=target_sr, res_type=res_type)
@@ -0,0 +1,254 @@
+"""
+Telepathy inference backends - how the API turns feature matrices into probabilities
+
+    savedmodel  the artifact written by export_model.py: padding, scaling and
+                class names live in the graph, one call per batch
+    keras       the original model_augmented.h5 + scaler.pkl +
+                label_encoder.pkl + feature_config.json files
+    onnx        ONNX Runtime model written by convert_model.py
+    tflite      TFLite model written by convert_model.py
+    stub        tiny NumPy stand-in with the real input shape and classes, for
+                load tests without a trained model (never chosen by "auto")
+
+The onnx and tflite backends need neither TensorFlow nor sklearn at serve
+time (just `onnxruntime`, or `ai-edge-litert` / `tflite-runtime`), which
+keeps worker memory small. Their class names and feature config live in a
+`<model>.json` file next to the model.
+
+With TELEPATHY_BACKEND=auto (default) the exported model is served when
+TELEPATHY_MODEL_DIR exists, otherwise the original files.
+
+Every backend exposes `class_names`, `feature_config`, `time_steps`,
+`version` (content hash of the model files) and `predict(feature_list, timer)`,
+which returns a (clips x classes) array.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from export_model import EXPORT_DIR, load_artifacts
+from feature_cache import file_digest
+
+# ==============================
+# CONFIG
+# ==============================
+BACKENDS = ("auto", "savedmodel", "keras", "onnx", "tflite", "stub")
+BACKEND = os.environ.get("TELEPATHY_BACKEND", "auto")
+ONNX_MODEL_PATH = os.environ.get("TELEPATHY_ONNX_MODEL", "model.onnx")
+TFLITE_MODEL_PATH = os.environ.get("TELEPATHY_TFLITE_MODEL", "model.tflite")
+MODEL_THREADS = int(os.environ.get("TELEPATHY_MODEL_THREADS", 0))  # 0: runtime default
+STUB_MODEL_MS = float(os.environ.get("TELEPATHY_STUB_MODEL_MS", 0))  # simulated model time per batch
+STUB_CLASSES = ("angry", "fearful", "happy", "neutral", "sad")
+
+# Heavy module each backend imports when it loads (timed separately at API startup)
+RUNTIME_MODULES = {"savedmodel": "tensorflow", "keras": "tensorflow", "onnx": "onnxruntime", "tflite": None,
+                   "stub": None}
+
+
+def pad_features(features, time_steps):
+    """Pad or truncate a (frames x features) matrix to the model's time steps"""
+    if features.shape[0] < time_steps:
+        features = np.pad(features, ((0, time_steps - features.shape[0]), (0,0)), mode='constant')
+    elif features.shape[0] > time_steps:
+        features = features[:time_steps, :]
+    return features
+
+
+def metadata_path(model_path):
+    return model_path + ".json"
+
+
+def artifact_version(*paths):
+    """Short content hash of model files and directories, identifying one trained model"""
+    digest = hashlib.sha256()
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for file in files:
+            digest.update(os.path.relpath(file, path).encode())
+            digest.update(file_digest(file).encode())
+    return digest.hexdigest()[:16]
+
+
+def upgrade_feature_config(config):
+    """Feature config of an artifact with the settings older ones left implicit filled in"""
+    from features import upgrade_feature_config
+    return upgrade_feature_config(config)
+
+
+def save_metadata(model_path, class_names, config, time_steps, quantize=None):
+    """Write the sidecar describing a converted model"""
+    with open(metadata_path(model_path), "w") as f:
+        json.dump({"class_names": [str(name) for name in class_names],
+                   "feature_config": config,
+                   "time_steps": int(time_steps),
+                   "quantize": quantize}, f, indent=2)
+
+
+def load_metadata(model_path):
+    with open(metadata_path(model_path)) as f:
+        return json.load(f)
+
+
+class SavedModelBackend:
+    """Exported model with preprocessing folded in (see export_model.py)"""
+    name = "savedmodel"
+
+    def __init__(self, path=EXPORT_DIR):
+        import tensorflow as tf
+
+        self._servable = tf.saved_model.load(path)
+        self.version = artifact_version(path)
+        self.class_names = [name.decode() for name in self._servable.classes().numpy()]
+        self.feature_config = upgrade_feature_config(json.loads(self._servable.feature_config().numpy()))
+        self.time_steps = int(self._servable.time_steps.numpy())
+
+    def predict(self, feature_list, timer):
+        frames = np.concatenate(feature_list).astype(np.float32, copy=False)
+        lengths = np.array([len(f) for f in feature_list], dtype=np.int64)
+        with timer.stage("model"):
+            outputs = self._servable.serve(frames, lengths)
+            return outputs["probabilities"].numpy()
+
+
+class KerasBackend:
+    """Original Keras model with the scaler and label encoder applied around it"""
+    name = "keras"
+
+    def __init__(self, model_path="model_augmented.h5", scaler_path="scaler.pkl",
+                 labels_path="label_encoder.pkl", config_path="feature_config.json"):
+        self.model, self.scaler, self.class_names, self.feature_config = load_artifacts(
+            model_path, scaler_path, labels_path, config_path)
+        self.version = artifact_version(model_path, scaler_path, labels_path)
+        self.time_steps = self.model.input_shape[1]
+
+    def predict(self, feature_list, timer):
+        batch = np.stack([pad_features(f, self.time_steps) for f in feature_list])
+
+        # Scale features
+        with timer.stage("scale"):
+            batch_scaled = self.scaler.transform(batch)
+
+        # Make prediction
+        with timer.stage("model"):
+            return np.asarray(self.model.predict_on_batch(batch_scaled))
+
+
+class OnnxBackend:
+    """Converted model on ONNX Runtime, scaling folded in"""
+    name = "onnx"
+
+    def __init__(self, path=ONNX_MODEL_PATH, threads=MODEL_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self._session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self._session.get_inputs()[0].name
+        metadata = load_metadata(path)
+        self.version = artifact_version(path, metadata_path(path))
+        self.class_names = metadata["class_names"]
+        self.feature_config = upgrade_feature_config(metadata["feature_config"])
+        self.time_steps = metadata["time_steps"]
+
+    def predict(self, feature_list, timer):
+        batch = np.stack([pad_features(f, self.time_steps) for f in feature_list]).astype(np.float32)
+        with timer.stage("model"):
+            return self._session.run(None, {self._input_name: batch})[0]
+
+
+class TFLiteBackend:
+    """Converted model on the TFLite interpreter, scaling folded in"""
+    name = "tflite"
+
+    def __init__(self, path=TFLITE_MODEL_PATH, threads=MODEL_THREADS):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                import tensorflow as tf
+                Interpreter = tf.lite.Interpreter
+
+        self._interpreter = Interpreter(path, num_threads=threads or None)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        metadata = load_metadata(path)
+        self.version = artifact_version(path, metadata_path(path))
+        self.class_names = metadata["class_names"]
+        self.feature_config = upgrade_feature_config(metadata["feature_config"])
+        self.time_steps = metadata["time_steps"]
+
+    def predict(self, feature_list, timer):
+        # Converted with a fixed batch of one (TFLite's LSTM needs static shapes)
+        probs = []
+        with timer.stage("model"):
+            for features in feature_list:
+                clip = pad_features(features, self.time_steps).astype(np.float32)
+                self._interpreter.set_tensor(self._input, clip[np.newaxis])
+                self._interpreter.invoke()
+                probs.append(self._interpreter.get_tensor(self._output)[0])
+        return np.array(probs)
+
+
+class StubBackend:
+    """
+    Stand-in model: a fixed random linear layer over the time-averaged features
+
+    Takes the same (time_steps x NUM_FEATURES) input as a model trained with
+    the current feature config and returns probabilities over STUB_CLASSES,
+    so the serving path runs end to end without TensorFlow or artifacts.
+    `model_ms` adds a simulated forward pass per batch.
+    """
+    name = "stub"
+
+    def __init__(self, model_ms=STUB_MODEL_MS):
+        from features import DURATION, HOP_LENGTH, NUM_FEATURES, feature_config
+        self.feature_config = feature_config()
+        self.class_names = list(STUB_CLASSES)
+        self.time_steps = 1 + int(DURATION * self.feature_config["sample_rate"]) // HOP_LENGTH
+        self.version = "stub"
+        self.model_ms = model_ms
+        self._weights = np.random.default_rng(0).normal(scale=0.1, size=(NUM_FEATURES, len(self.class_names)))
+
+    def predict(self, feature_list, timer):
+        batch = np.stack([pad_features(f, self.time_steps) for f in feature_list]).astype(np.float32)
+        with timer.stage("model"):
+            logits = batch.mean(axis=1) @ self._weights
+            if self.model_ms:
+                time.sleep(self.model_ms / 1000)
+            probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+            return probs / probs.sum(axis=1, keepdims=True)
+
+
+def resolve_backend(kind=BACKEND, path=None):
+    """Name of the backend `load_backend(kind, path)` will load"""
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown backend: {kind!r} (expected one of {BACKENDS})")
+    if kind == "auto":
+        return "savedmodel" if os.path.isdir(path or EXPORT_DIR) else "keras"
+    return kind
+
+
+def load_backend(kind=BACKEND, path=None):
+    """
+    Load the configured backend; "auto" prefers the exported model.
+
+    `path` overrides the backend's default model location.
+    """
+    kind = resolve_backend(kind, path)
+    if kind == "savedmodel":
+        return SavedModelBackend(path or EXPORT_DIR)
+    if kind == "onnx":
+        return OnnxBackend(path or ONNX_MODEL_PATH)
+    if kind == "tflite":
+        return TFLiteBackend(path or TFLITE_MODEL_PATH)
+    if kind == "stub":
+        return StubBackend()
+    return KerasBackend(path or "model_augmented.h5")
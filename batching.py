@@ -0,0 +1,99 @@
+"""
+Telepathy micro-batching - groups concurrent model calls into one forward pass
+"""
+import asyncio
+import os
+import time
+
+from metrics import BATCH_SIZE_BUCKETS, histogram
+
+# ==============================
+# CONFIG
+# ==============================
+MAX_BATCH_SIZE = int(os.environ.get("TELEPATHY_MAX_BATCH_SIZE", 16))
+MAX_BATCH_WAIT_MS = float(os.environ.get("TELEPATHY_MAX_BATCH_WAIT_MS", 5))
+
+
+class MicroBatcher:
+    """
+    Collect items from concurrent requests and run them as one batch.
+
+    A batch is flushed when it reaches `max_batch_size` items or when the
+    oldest item has waited `max_wait_ms`, whichever comes first. Only one
+    batch runs at a time; items arriving meanwhile form the next batch.
+    `run_batch` is an async callable mapping a list of items to a list of
+    results in the same order.
+    """
+
+    def __init__(self, run_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.batch_sizes = histogram("batch_size", "Items per model forward pass",
+                                     BATCH_SIZE_BUCKETS)
+        self.queue_wait = histogram("batch_queue_wait_ms",
+                                    "Time an item waited for its batch to start (ms)")
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, item):
+        """Queue an item; returns `(result, queue_wait_ms)` once its batch has run"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        """Wait for the first item, then gather more until the batch is full or due"""
+        pending = [await self._queue.get()]
+        deadline = pending[0][2] + self.max_wait
+        while len(pending) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                if timeout > 0:
+                    pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                else:
+                    pending.append(self._queue.get_nowait())
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+        return pending
+
+    async def _run(self):
+        while True:
+            pending = await self._collect()
+            # Drop items whose request was cancelled while waiting
+            pending = [entry for entry in pending if not entry[1].done()]
+            if not pending:
+                continue
+
+            started = time.perf_counter()
+            waits = []
+            for _, _, enqueued in pending:
+                wait_ms = (started - enqueued) * 1000
+                self.queue_wait.observe(wait_ms)
+                waits.append(wait_ms)
+            self.batch_sizes.observe(len(pending))
+
+            try:
+                results = await self.run_batch([item for item, _, _ in pending])
+            except Exception as e:
+                for _, future, _ in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), result, wait_ms in zip(pending, results, waits):
+                if not future.done():
+                    future.set_result((result, wait_ms))
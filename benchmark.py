@@ -0,0 +1,285 @@
+"""
+Telepathy benchmarks - reproducible latency and throughput of the serving pipeline
+
+Clips are synthesized with `create_sample_data.generate_emotional_audio` from
+fixed seeds, so every run measures the same audio. Three suites:
+    features   `extract_features` per step (stft, mfcc, chroma, contrast,
+               tonnetz) and in total, per clip
+    model      the backend's `predict` at batch sizes 1-64 (per batch and per clip)
+    api        `/predict` end to end through an in-process ASGI client at a
+               given concurrency (result cache off)
+
+Each suite reports throughput, mean / p50 / p90 / p95 / p99 latency (ms) and
+the process's peak RSS so far. The JSON report (--output) also records the
+backend, model version, feature config and library versions. --baseline
+compares against an earlier report and exits with status 1 when a p95
+latency rose, or a throughput fell, by more than --tolerance.
+
+The model and api suites use the backend chosen by TELEPATHY_BACKEND; the
+api suite needs `httpx`.
+
+Usage:
+    python benchmark.py [--suites features model api] [--clips 20] [--repeats 3]
+                        [--batch-sizes 1 2 4 8 16 32 64] [--concurrency 4] [--requests 40]
+                        [--output bench.json] [--baseline old_bench.json] [--tolerance 0.1]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from create_sample_data import EMOTIONS, generate_emotional_audio
+from engine import StageTimer
+from evaluate import latency_summary
+
+SUITES = ("features", "model", "api")
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64)
+SEED = 1234
+FEATURE_STEPS = ("stft", "mfcc", "chroma", "contrast", "tonnetz", "features")
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far (MB), or None where `resource` is missing"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)  # bytes on macOS, KB elsewhere
+
+
+def synthesize_clips(count, sample_rate, duration, seed=SEED):
+    """`count` float32 clips cycling through the emotions, the same for a given seed"""
+    return [generate_emotional_audio(EMOTIONS[i % len(EMOTIONS)], duration, sample_rate,
+                                     rng=np.random.default_rng(seed + i)).astype(np.float32)
+            for i in range(count)]
+
+
+def summarize(samples_ms, items, elapsed_s):
+    """Latency percentiles plus throughput (items per second) and peak RSS"""
+    summary = latency_summary(samples_ms)
+    summary.update(throughput_per_s=round(items / elapsed_s, 3), peak_rss_mb=peak_rss_mb())
+    return summary
+
+
+# ==============================
+# SUITES
+# ==============================
+def bench_features(clips, config, repeats):
+    """Time every feature step over all clips, `repeats` times (after one warm-up clip)"""
+    from features import extract_features
+    extract_features(clips[0], config["sample_rate"], tonnetz_mode=config["tonnetz_mode"])
+
+    steps = {step: [] for step in FEATURE_STEPS}
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for clip in clips:
+            timer = StageTimer()
+            with timer.stage("features"):
+                extract_features(clip, config["sample_rate"], tonnetz_mode=config["tonnetz_mode"], timer=timer)
+            for step in FEATURE_STEPS:
+                steps[step].append(timer.timings[step])
+    elapsed = time.perf_counter() - start
+    report = {step: latency_summary(samples) for step, samples in steps.items()}
+    report["features"] = summarize(steps["features"], len(steps["features"]), elapsed)
+    return report
+
+
+def bench_model(backend, clips, config, batch_sizes, repeats):
+    """Time `backend.predict` at each batch size (clips reused to fill large batches)"""
+    from features import extract_features
+    features = [extract_features(clip, config["sample_rate"], tonnetz_mode=config["tonnetz_mode"])
+                for clip in clips]
+
+    report = {}
+    for batch_size in batch_sizes:
+        batch = [features[i % len(features)] for i in range(batch_size)]
+        backend.predict(batch, StageTimer())  # warm-up for this shape
+        samples = []
+        start = time.perf_counter()
+        for _ in range(max(repeats, 64 // batch_size)):
+            timer = StageTimer()
+            with timer.stage("batch"):
+                backend.predict(batch, timer)
+            samples.append(timer.timings["batch"])
+        elapsed = time.perf_counter() - start
+        summary = summarize(samples, len(samples) * batch_size, elapsed)
+        summary["per_clip_ms"] = round(summary["mean"] / batch_size, 3)
+        report[str(batch_size)] = summary
+    return report
+
+
+async def _bench_api(uploads, concurrency, requests):
+    import httpx
+    import api
+
+    await api.load_models()  # the startup event, in blocking mode
+    transport = httpx.ASGITransport(app=api.app)
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/predict", files={"file": (f"clip_{i}.wav", uploads[i % len(uploads)])})
+                samples.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code != 200
+
+        await one(0)  # warm-up request
+        samples.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    await api.stop_engine()
+
+    report = summarize(samples, requests, elapsed)
+    report.update(concurrency=concurrency, requests=requests, errors=errors)
+    return report
+
+
+def bench_api(clips, sample_rate, concurrency, requests):
+    """`/predict` end to end with `concurrency` requests in flight, result cache disabled"""
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        raise SystemExit("❌ The api suite needs httpx: pip install httpx")
+    import soundfile as sf
+
+    os.environ["TELEPATHY_STARTUP"] = "blocking"
+    os.environ["TELEPATHY_RESULT_CACHE_SIZE"] = "0"
+    uploads = []
+    for clip in clips:
+        buffer = io.BytesIO()
+        sf.write(buffer, clip, sample_rate, format="WAV")
+        uploads.append(buffer.getvalue())
+    return asyncio.run(_bench_api(uploads, concurrency, requests))
+
+
+# ==============================
+# REPORTING
+# ==============================
+def environment(backend, config):
+    import librosa
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "backend": backend.name if backend else None,
+        "model_version": backend.version if backend else None,
+        "feature_config": config,
+    }
+
+
+def flatten(report, prefix=""):
+    """`{"suite/case": summary}` for every latency summary in a report"""
+    rows = {}
+    for name, value in report.items():
+        if isinstance(value, dict) and "p95" in value:
+            rows[prefix + name] = value
+        elif isinstance(value, dict):
+            rows.update(flatten(value, f"{prefix}{name}/"))
+    return rows
+
+
+def compare(report, baseline, tolerance):
+    """Print p95 and throughput changes; returns the regressions beyond `tolerance`"""
+    old_rows = flatten(baseline["results"])
+    regressions = []
+    print(f"\n🔁 Against {baseline['created']} (tolerance {tolerance:.0%}):")
+    for key in ("feature_config", "backend", "model_version", "cpu_count"):
+        old, new = baseline["environment"].get(key), report["environment"].get(key)
+        if old is not None and new is not None and old != new:
+            print(f"   ⚠️  {key} differs from the baseline; the numbers are not like for like")
+    for name, new in flatten(report["results"]).items():
+        old = old_rows.get(name)
+        if old is None:
+            continue
+        found = len(regressions)
+        change = (new["p95"] - old["p95"]) / old["p95"] if old["p95"] else 0.0
+        line = f"{name:28s} p95 {old['p95']:9.1f} -> {new['p95']:9.1f} ms ({change:+.1%})"
+        if change > tolerance:
+            regressions.append(f"{name} p95 +{change:.1%}")
+        if "throughput_per_s" in new and old.get("throughput_per_s"):
+            drop = 1 - new["throughput_per_s"] / old["throughput_per_s"]
+            line += f", {old['throughput_per_s']:.2f} -> {new['throughput_per_s']:.2f}/s"
+            if drop > tolerance:
+                regressions.append(f"{name} throughput -{drop:.1%}")
+        print(f" {'⚠️ ' if len(regressions) > found else '  '} {line}")
+    return regressions
+
+
+def print_rows(report):
+    print(f"\n{'case':30s} {'mean':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'per s':>9s} {'RSS MB':>8s}")
+    for name, s in flatten(report["results"]).items():
+        throughput = f"{s['throughput_per_s']:9.2f}" if "throughput_per_s" in s else " " * 9
+        rss = f"{s['peak_rss_mb']:8.0f}" if s.get("peak_rss_mb") else " " * 8
+        print(f"{name:30s} {s['mean']:9.1f} {s['p50']:9.1f} {s['p95']:9.1f} {s['p99']:9.1f} {throughput} {rss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--suites", nargs="+", default=list(SUITES), choices=SUITES)
+    parser.add_argument("--clips", type=int, default=20, help="synthetic clips (cycling through the emotions)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=list(BATCH_SIZES))
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight in the api suite")
+    parser.add_argument("--requests", type=int, default=40, help="requests in the api suite")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative slowdown before flagging")
+    args = parser.parse_args()
+
+    from backends import load_backend
+    from features import check_feature_config, feature_config
+    backend = load_backend() if {"model", "api"} & set(args.suites) else None
+    config = check_feature_config(backend.feature_config if backend else feature_config())
+    clips = synthesize_clips(args.clips, config["sample_rate"], config["duration"])
+    print(f"🎛️  {len(clips)} clips at {config['sample_rate']} Hz, tonnetz {config['tonnetz_mode']}"
+          + (f", {backend.name} backend" if backend else ""))
+
+    results = {}
+    if "features" in args.suites:
+        print("⏱️  features...")
+        results["features"] = bench_features(clips, config, args.repeats)
+    if "model" in args.suites:
+        print("⏱️  model...")
+        results["model"] = bench_model(backend, clips, config, args.batch_sizes, args.repeats)
+    if "api" in args.suites:
+        print(f"⏱️  api ({args.requests} requests, concurrency {args.concurrency})...")
+        results["api"] = {"predict": bench_api(clips, config["sample_rate"], args.concurrency, args.requests)}
+
+    report = {
+        "created": datetime.now().isoformat(),
+        "settings": {"clips": args.clips, "repeats": args.repeats, "seed": SEED},
+        "environment": environment(backend, config),
+        "results": results,
+    }
+    print_rows(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n📁 Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions: " + "; ".join(regressions))
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
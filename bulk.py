@@ -0,0 +1,100 @@
+"""
+Telepathy bulk inputs - expand uploaded files and archives into audio files
+
+`/predict/batch` accepts any mix of audio files and zip / tar archives
+(optionally gzip / bz2 / xz compressed). `iter_audio_files` walks one upload
+and yields `(name, contents)` for every file in it, or `(name, error)` for
+members that cannot be used, one member at a time so an archive is never
+unpacked as a whole.
+"""
+import os
+import tarfile
+import zipfile
+
+# ==============================
+# CONFIG
+# ==============================
+MAX_FILES = int(os.environ.get("TELEPATHY_BATCH_MAX_FILES", 10000))             # per request
+MAX_FILE_BYTES = int(float(os.environ.get("TELEPATHY_BATCH_MAX_FILE_MB", 50)) * 2 ** 20)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class FileError(Exception):
+    """One file of a bulk upload could not be read"""
+
+
+def archive_kind(name, fileobj):
+    """"zip", "tar" or None for an upload (reads its first bytes, then rewinds)"""
+    head = fileobj.read(262)
+    fileobj.seek(0)
+    if head[:4] == b"PK\x03\x04":
+        return "zip"
+    if head[257:262] == b"ustar" or (name or "").lower().endswith(TAR_SUFFIXES):
+        return "tar"
+    return None
+
+
+def _read_member(name, size, read, max_bytes):
+    if size > max_bytes:
+        return name, FileError(f"{size / 2 ** 20:.0f} MB exceeds the {max_bytes / 2 ** 20:.0f} MB limit")
+    return name, read()
+
+
+def iter_audio_files(name, fileobj, max_bytes=MAX_FILE_BYTES):
+    """
+    Yield `(name, contents)` for every file in an upload.
+
+    Archive members are named `<archive>/<member>`. A member that is too big
+    or unreadable yields `(name, FileError)` instead; hidden files and
+    directories are skipped.
+    """
+    kind = archive_kind(name, fileobj)
+    if kind is None:
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+        yield _read_member(name, size, fileobj.read, max_bytes)
+        return
+
+    if kind == "zip":
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                member = os.path.basename(info.filename)
+                if info.is_dir() or not member or member.startswith("."):
+                    continue
+                try:
+                    yield _read_member(f"{name}/{info.filename}", info.file_size,
+                                       lambda: archive.read(info), max_bytes)
+                except (zipfile.BadZipFile, RuntimeError, OSError) as e:
+                    yield f"{name}/{info.filename}", FileError(str(e))
+        return
+
+    with tarfile.open(fileobj=fileobj, mode="r:*") as archive:
+        for info in archive:
+            member = os.path.basename(info.name)
+            if not info.isfile() or not member or member.startswith("."):
+                continue
+            try:
+                yield _read_member(f"{name}/{info.name}", info.size,
+                                   lambda: archive.extractfile(info).read(), max_bytes)
+            except (tarfile.TarError, OSError) as e:
+                yield f"{name}/{info.name}", FileError(str(e))
+
+
+def iter_uploads(uploads, max_files=MAX_FILES):
+    """
+    Yield `(name, contents or FileError)` for every file of several uploads.
+
+    `uploads` are `(filename, fileobj)` pairs. A corrupt archive is one error
+    entry; files beyond `max_files` end the iteration with an error entry.
+    """
+    count = 0
+    for name, fileobj in uploads:
+        try:
+            for item in iter_audio_files(name, fileobj):
+                count += 1
+                if count > max_files:
+                    yield item[0], FileError(f"More than {max_files} files in one request; the rest were skipped")
+                    return
+                yield item
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+            yield name, FileError(f"Unreadable archive: {e}")
@@ -0,0 +1,141 @@
+"""
+Compare feature pipeline settings on the sample data: extraction latency vs. accuracy
+
+For every tonnetz mode the script reports
+  - extraction latency per clip (mean / p95, audio already decoded)
+  - tonnetz deviation from the reference `hpss_cqt` mode
+  - accuracy of a quick proxy classifier (logistic regression on the per-clip
+    mean and std of every feature, stratified 5-fold cross-validation)
+
+For every sample rate (16 / 22.05 / 44.1 kHz by default, configured tonnetz
+mode and res_type) it reports decode + resample latency, extraction latency
+and the proxy accuracy. Train at a rate with TELEPATHY_SAMPLE_RATE; the rate
+is saved in the feature config and used when serving.
+
+The proxy classifier avoids retraining the LSTM for every setting; it ranks
+feature sets reliably but its absolute accuracy is not the LSTM's.
+
+Usage:
+    python compare_features.py [--data sample_data] [--modes hpss_cqt chroma]
+                               [--sample-rates 16000 22050 44100] [--res-type soxr_hq] [--output report.json]
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from features import (RES_TYPE, SAMPLE_RATE, TONNETZ_MODE, TONNETZ_MODES, N_MFCC, load_audio,
+                      extract_features)
+from ingest import list_emotion_folders
+
+TONNETZ_COLUMNS = slice(N_MFCC + 12 + 7, None)
+
+
+def pooled(features):
+    """Summarise a (frames x features) matrix as per-feature mean and std"""
+    return np.concatenate([features.mean(axis=0), features.std(axis=0)])
+
+
+def proxy_accuracy(X, y):
+    classifier = make_pipeline(StandardScaler(), LogisticRegression(max_iter=2000))
+    smallest_class = np.unique(y, return_counts=True)[1].min()
+    folds = StratifiedKFold(n_splits=min(5, smallest_class), shuffle=True, random_state=42)
+    return float(cross_val_score(classifier, X, y, cv=folds).mean())
+
+
+def evaluate_mode(clips, labels, sample_rate, tonnetz_mode, reference=None):
+    """Extract every clip with one setting and summarise latency and accuracy"""
+    extract_features(clips[0], sample_rate, tonnetz_mode=tonnetz_mode)  # warm-up
+
+    latencies, matrices = [], []
+    for audio in clips:
+        start = time.perf_counter()
+        matrices.append(extract_features(audio, sample_rate, tonnetz_mode=tonnetz_mode))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        "tonnetz_mode": tonnetz_mode,
+        "sample_rate": sample_rate,
+        "latency_ms_mean": float(np.mean(latencies)),
+        "latency_ms_p95": float(np.percentile(latencies, 95)),
+        "proxy_accuracy": proxy_accuracy(np.array([pooled(m) for m in matrices]), np.array(labels)),
+    }
+    if reference is not None:
+        deviation = [np.abs(m[:, TONNETZ_COLUMNS] - r[:, TONNETZ_COLUMNS]).mean()
+                     for m, r in zip(matrices, reference)]
+        result["tonnetz_mean_abs_deviation"] = float(np.mean(deviation))
+    return result, matrices
+
+
+def evaluate_sample_rate(items, labels, sample_rate, res_type, tonnetz_mode):
+    """Decode every clip at `sample_rate`, then summarise latency and accuracy"""
+    clips, decode_latencies = [], []
+    for path, _ in items:
+        start = time.perf_counter()
+        clips.append(load_audio(path, sample_rate, res_type=res_type))
+        decode_latencies.append((time.perf_counter() - start) * 1000)
+
+    result, _ = evaluate_mode(clips, labels, sample_rate, tonnetz_mode)
+    result["res_type"] = res_type
+    result["decode_ms_mean"] = float(np.mean(decode_latencies))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="sample_data")
+    parser.add_argument("--modes", nargs="+", default=list(TONNETZ_MODES), choices=TONNETZ_MODES,
+                        help="modes compared against the hpss_cqt baseline")
+    parser.add_argument("--sample-rates", nargs="*", type=int, default=[16000, 22050, 44100],
+                        help=f"sample rates compared with the {TONNETZ_MODE} mode (none to skip)")
+    parser.add_argument("--res-type", default=RES_TYPE, help="resampler used to decode at each rate")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    items = list_emotion_folders(args.data, sorted(os.listdir(args.data)))
+    if not items:
+        raise SystemExit(f"❌ No labeled .wav files in {args.data}! Run create_sample_data.py first.")
+    print(f"📂 {len(items)} clips from {args.data}")
+
+    clips = [load_audio(path, SAMPLE_RATE) for path, _ in items]
+    labels = [emotion for _, emotion in items]
+
+    # The original hpss_cqt path is always measured as the baseline
+    baseline, reference = evaluate_mode(clips, labels, SAMPLE_RATE, "hpss_cqt")
+    report = [baseline]
+    for mode in args.modes:
+        if mode != "hpss_cqt":
+            report.append(evaluate_mode(clips, labels, SAMPLE_RATE, mode, reference)[0])
+
+    print(f"\n{'mode':12s} {'mean ms':>9s} {'p95 ms':>9s} {'speedup':>8s} {'accuracy':>9s} {'tonnetz dev':>12s}")
+    for r in report:
+        speedup = baseline["latency_ms_mean"] / r["latency_ms_mean"]
+        print(f"{r['tonnetz_mode']:12s} {r['latency_ms_mean']:9.1f} {r['latency_ms_p95']:9.1f} "
+              f"{speedup:7.2f}x {r['proxy_accuracy']:9.3f} {r.get('tonnetz_mean_abs_deviation', 0.0):12.4f}")
+
+    # Sample rates, each decoded from the original files
+    rate_report = [evaluate_sample_rate(items, labels, rate, args.res_type, TONNETZ_MODE)
+                   for rate in args.sample_rates]
+    if rate_report:
+        slowest = max(r["decode_ms_mean"] + r["latency_ms_mean"] for r in rate_report)
+        print(f"\n{TONNETZ_MODE} mode, res_type {args.res_type}:")
+        print(f"{'rate Hz':>8s} {'decode ms':>10s} {'mean ms':>9s} {'p95 ms':>9s} {'speedup':>8s} {'accuracy':>9s}")
+        for r in rate_report:
+            speedup = slowest / (r["decode_ms_mean"] + r["latency_ms_mean"])
+            print(f"{r['sample_rate']:8d} {r['decode_ms_mean']:10.1f} {r['latency_ms_mean']:9.1f} "
+                  f"{r['latency_ms_p95']:9.1f} {speedup:7.2f}x {r['proxy_accuracy']:9.3f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"tonnetz_modes": report, "sample_rates": rate_report}, f, indent=2)
+        print(f"\n📁 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
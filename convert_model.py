@@ -0,0 +1,242 @@
+"""
+Telepathy model conversion - lightweight CPU inference backends
+
+Converts the trained model (model_augmented.h5 + scaler.pkl + label_encoder.pkl
++ feature_config.json) for a runtime that does not need TensorFlow at serve time:
+
+    onnx     ONNX Runtime, dynamic batch size
+             --quantize int8: weights quantized to int8 (dynamic quantization)
+    tflite   TFLite / LiteRT, fixed batch of one (clips run one after another)
+             --quantize dynamic: dynamic-range quantization of the weights
+
+The scaler is folded into the converted graph; class names, feature config
+and time steps are written to `<output>.json`. Serve with
+TELEPATHY_BACKEND=onnx or tflite (see backends.py).
+
+After converting, the script
+  - checks parity with the Keras pipeline on the sample data: max probability
+    difference and top-1 agreement (fails below --min-agreement)
+  - compares load time, peak process memory and per-request latency of the
+    Keras backend and the converted one, each measured in a fresh process
+
+Full-integer (int8 activations) TFLite conversion is not offered: the LSTM
+layers do not convert reliably that way.
+
+Usage:
+    python convert_model.py --format onnx [--quantize int8] [--data sample_data] [--output model.onnx]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import time
+from functools import partial
+
+import numpy as np
+
+from backends import (KerasBackend, ONNX_MODEL_PATH, TFLITE_MODEL_PATH, load_backend, pad_features,
+                      save_metadata)
+from engine import StageTimer
+
+QUANTIZE_MODES = {"onnx": ("none", "int8"), "tflite": ("none", "dynamic")}
+DEFAULT_OUTPUT = {"onnx": ONNX_MODEL_PATH, "tflite": TFLITE_MODEL_PATH}
+MAX_FLOAT_DIFF = 1e-4
+ONNX_OPSET = 17
+
+
+# ==============================
+# CONVERSION
+# ==============================
+def scaled_model(model, scaler, batch_size=None):
+    """Keras model that applies the scaler's normalisation before `model`"""
+    import tensorflow as tf
+
+    mean, scale = scaler.statistics()
+    time_steps, num_features = model.input_shape[1], model.input_shape[2]
+    inputs = tf.keras.Input(shape=(time_steps, num_features), batch_size=batch_size, name="features")
+    normalize = tf.keras.layers.Normalization(axis=tuple(range(3 - np.ndim(mean), 3)),
+                                              mean=mean, variance=np.square(scale))
+    return tf.keras.Model(inputs, model(normalize(inputs)))
+
+
+def convert_onnx(model, scaler, path, quantize="none"):
+    import tensorflow as tf
+    import tf2onnx
+
+    # NumPy statistics become graph constants (captured tensors would become model inputs)
+    mean, scale = (np.asarray(a, dtype=np.float32) for a in scaler.statistics())
+    signature = [tf.TensorSpec([None, *model.input_shape[1:]], tf.float32, name="features")]
+    serve = tf.function(lambda features: model((features - mean) / scale, training=False),
+                        input_signature=signature)
+    if quantize == "none":
+        tf2onnx.convert.from_function(serve, input_signature=signature, opset=ONNX_OPSET, output_path=path)
+        return
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    float_path = path + ".float.tmp"
+    tf2onnx.convert.from_function(serve, input_signature=signature, opset=ONNX_OPSET, output_path=float_path)
+    try:
+        quantize_dynamic(float_path, path, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(float_path)
+
+
+def convert_tflite(model, scaler, path, quantize="none"):
+    import tensorflow as tf
+
+    # TFLite's fused LSTM needs static shapes, so the batch size is fixed to one
+    converter = tf.lite.TFLiteConverter.from_keras_model(scaled_model(model, scaler, batch_size=1))
+    if quantize == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+# ==============================
+# PARITY
+# ==============================
+def _extract_file(path, rng, config):
+    """Silence-gated features of one clip, as train_simple.py extracts them (the cache key is shared)"""
+    from features import extract_features, load_audio
+    from vad import apply_vad
+    audio = load_audio(path, config["sample_rate"], config["duration"], config["res_type"])
+    audio, _ = apply_vad(audio, config["sample_rate"], config)
+    if not len(audio):
+        raise ValueError("No speech detected")
+    return extract_features(audio, config["sample_rate"], tonnetz_mode=config["tonnetz_mode"])
+
+
+def sample_features(data_path, config):
+    """Features of every clip under `<data>/<emotion>/*.wav` (through the feature cache)"""
+    from ingest import iter_dataset, list_emotion_folders
+
+    items = list_emotion_folders(data_path, sorted(os.listdir(data_path)))
+    return [features for _, _, features, error in
+            iter_dataset(items, partial(_extract_file, config=config), config)
+            if error is None]
+
+
+def check_parity(model, scaler, backend, features):
+    """Max probability difference and top-1 agreement of `backend` vs. Keras"""
+    batch = np.stack([pad_features(f, model.input_shape[1]) for f in features])
+    expected = np.asarray(model.predict_on_batch(scaler.transform(batch)))
+    actual = backend.predict(features, StageTimer())
+    return (float(np.abs(actual - expected).max()),
+            float(np.mean(actual.argmax(axis=1) == expected.argmax(axis=1))))
+
+
+# ==============================
+# LATENCY / MEMORY
+# ==============================
+def peak_rss_mb():
+    """Peak resident memory of this process (VmHWM; ru_maxrss survives exec on Linux)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(kind, paths, features, repeats=5):
+    """
+    Runs in a fresh process: load time, peak RSS and latency of one backend
+
+    `paths` are the backend's files: model, scaler, labels and feature config
+    for keras, the converted model otherwise.
+    """
+    start = time.perf_counter()
+    backend = KerasBackend(*paths) if kind == "keras" else load_backend(kind, *paths)
+    load_s = time.perf_counter() - start
+
+    backend.predict(features[:1], StageTimer())  # warm-up
+    single = []
+    for clip in features:
+        start = time.perf_counter()
+        backend.predict([clip], StageTimer())
+        single.append((time.perf_counter() - start) * 1000)
+
+    batch = features[:16]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        backend.predict(batch, StageTimer())
+    batch_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    return {
+        "load_s": load_s,
+        "peak_rss_mb": peak_rss_mb(),
+        "clip_ms_p50": float(np.percentile(single, 50)),
+        "clip_ms_p95": float(np.percentile(single, 95)),
+        "batch_ms": batch_ms,
+        "batch_size": len(batch),
+    }
+
+
+def measure(kind, paths, features):
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure, (kind, paths, features))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the trained model for a lightweight CPU backend")
+    parser.add_argument("--format", choices=sorted(QUANTIZE_MODES), required=True)
+    parser.add_argument("--quantize", default="none",
+                        help="onnx: none | int8, tflite: none | dynamic")
+    parser.add_argument("--model", default="model_augmented.h5")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--labels", default="label_encoder.pkl")
+    parser.add_argument("--feature-config", default="feature_config.json")
+    parser.add_argument("--data", default="sample_data", help="clips used for the parity check and timings")
+    parser.add_argument("--min-agreement", type=float, default=0.95,
+                        help="lowest acceptable top-1 agreement with the Keras model")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.quantize not in QUANTIZE_MODES[args.format]:
+        parser.error(f"--quantize for {args.format} must be one of {QUANTIZE_MODES[args.format]}")
+    output = args.output or DEFAULT_OUTPUT[args.format]
+
+    from export_model import load_artifacts
+
+    model, scaler, class_names, config = load_artifacts(args.model, args.scaler, args.labels,
+                                                        args.feature_config)
+    convert = convert_onnx if args.format == "onnx" else convert_tflite
+    convert(model, scaler, output, args.quantize)
+    save_metadata(output, class_names, config, model.input_shape[1], args.quantize)
+    print(f"✅ Converted {args.model} to {output} ({args.format}, quantize={args.quantize}, "
+          f"{os.path.getsize(output) / 1024:.0f} KB)")
+
+    # ==============================
+    # PARITY ON THE SAMPLE DATA
+    # ==============================
+    features = sample_features(args.data, config)
+    if not features:
+        raise SystemExit(f"❌ No labeled .wav files in {args.data}! Run create_sample_data.py first.")
+    max_diff, agreement = check_parity(model, scaler, load_backend(args.format, output), features)
+    print(f"🔍 {len(features)} clips: max probability difference {max_diff:.2e}, "
+          f"top-1 agreement {agreement:.1%}")
+    if args.quantize == "none" and max_diff > MAX_FLOAT_DIFF:
+        raise SystemExit("❌ Converted model does not match the Keras model")
+    if agreement < args.min_agreement:
+        raise SystemExit(f"❌ Top-1 agreement below {args.min_agreement:.0%}")
+
+    # ==============================
+    # LATENCY / MEMORY
+    # ==============================
+    print("\n⏱️  Measuring each backend in a fresh process...")
+    keras_paths = (args.model, args.scaler, args.labels, args.feature_config)
+    results = {"keras": measure("keras", keras_paths, features),
+               f"{args.format} ({args.quantize})": measure(args.format, (output,), features)}
+    print(f"\n{'backend':16s} {'load s':>7s} {'peak RSS MB':>12s} {'clip p50 ms':>12s} "
+          f"{'clip p95 ms':>12s} {'batch ms':>9s}")
+    for name, r in results.items():
+        print(f"{name:16s} {r['load_s']:7.2f} {r['peak_rss_mb']:12.0f} {r['clip_ms_p50']:12.1f} "
+              f"{r['clip_ms_p95']:12.1f} {r['batch_ms']:9.1f}")
+    print(f"(batch = {results['keras']['batch_size']} clips in one call)")
+
+
+if __name__ == "__main__":
+    main()
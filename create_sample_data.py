@@ -7,9 +7,11 @@ import librosa
 import soundfile as sf
 import os
 
-def generate_emotional_audio(emotion, duration=5, sr=44100):
+def generate_emotional_audio(emotion, duration=5, sr=44100, rng=None):
     """
     Generate synthetic audio with characteristics of different emotions
+
+    Pass a seeded `rng` (np.random.default_rng) for reproducible noise.
     """
     t = np.linspace(0, duration, int(sr * duration))
     
@@ -34,7 +36,7 @@ def generate_emotional_audio(emotion, duration=5, sr=44100):
         signal += np.sin(2 * np.pi * (freq + variation) * t) / i
     
     # Add noise based on emotion
-    noise = np.random.normal(0, params['noise'], len(t))
+    noise = (rng or np.random).normal(0, params['noise'], len(t))
     signal += noise
     
     # Normalize
@@ -42,24 +44,29 @@ def generate_emotional_audio(emotion, duration=5, sr=44100):
     
     return signal
 
-# Create sample data directory
-os.makedirs('sample_data', exist_ok=True)
-
-emotions = ['neutral', 'happy', 'sad', 'angry', 'fearful']
-samples_per_emotion = 20
-
-print("Generating sample emotional audio data...")
+EMOTIONS = ['neutral', 'happy', 'sad', 'angry', 'fearful']
 
-for emotion in emotions:
-    emotion_dir = os.path.join('sample_data', emotion)
-    os.makedirs(emotion_dir, exist_ok=True)
+def main():
+    # Create sample data directory
+    os.makedirs('sample_data', exist_ok=True)
+    
+    samples_per_emotion = 20
+    
+    print("Generating sample emotional audio data...")
     
-    for i in range(samples_per_emotion):
-        audio = generate_emotional_audio(emotion)
-        filename = os.path.join(emotion_dir, f'{emotion}_{i:02d}.wav')
-        sf.write(filename, audio, 44100)
+    for emotion in EMOTIONS:
+        emotion_dir = os.path.join('sample_data', emotion)
+        os.makedirs(emotion_dir, exist_ok=True)
+        
+        for i in range(samples_per_emotion):
+            audio = generate_emotional_audio(emotion)
+            filename = os.path.join(emotion_dir, f'{emotion}_{i:02d}.wav')
+            sf.write(filename, audio, 44100)
+        
+        print(f"Created {samples_per_emotion} samples for {emotion}")
     
-    print(f"Created {samples_per_emotion} samples for {emotion}")
+    print(f"\nTotal samples created: {len(EMOTIONS) * samples_per_emotion}")
+    print("Sample data saved in: ./sample_data/")
 
-print(f"\nTotal samples created: {len(emotions) * samples_per_emotion}")
-print("Sample data saved in: ./sample_data/")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Telepathy training dataset - memory-mapped feature store and streaming batches
+
+On-disk layout (one directory per dataset):
+
+    features.f32   every clip's (frames x features) matrix as float32,
+                   concatenated along the frame axis
+    index.npz      offset, length and label of every clip
+
+Clips are read through a memory map and padded and scaled one batch at a
+time, so training memory stays flat however large the corpus grows.
+"""
+import os
+
+import numpy as np
+from features import NUM_FEATURES
+from scaling import SCALER_MODE, ChannelScaler, make_scaler
+
+# ==============================
+# CONFIG
+# ==============================
+STORE_DIR = os.environ.get("TELEPATHY_FEATURE_STORE_DIR", ".feature_store")
+FEATURES_FILE = "features.f32"
+INDEX_FILE = "index.npz"
+
+
+class FeatureStoreWriter:
+    """Append clips to a new feature store, one at a time"""
+
+    def __init__(self, path, num_features=NUM_FEATURES):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.num_features = num_features
+        self.offsets = []
+        self.lengths = []
+        self.labels = []
+        self._frames = 0
+        self._tmp_path = os.path.join(path, FEATURES_FILE + ".tmp")
+        self._file = open(self._tmp_path, "wb")
+
+    def append(self, features, label):
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != self.num_features:
+            raise ValueError(f"Expected (frames, {self.num_features}) features, got {features.shape}")
+        self._file.write(features.tobytes())
+        self.offsets.append(self._frames)
+        self.lengths.append(features.shape[0])
+        self.labels.append(label)
+        self._frames += features.shape[0]
+
+    def close(self):
+        """Finish the store and write its index"""
+        self._file.close()
+        os.replace(self._tmp_path, os.path.join(self.path, FEATURES_FILE))
+        np.savez(os.path.join(self.path, INDEX_FILE),
+                 offsets=np.array(self.offsets, dtype=np.int64),
+                 lengths=np.array(self.lengths, dtype=np.int64),
+                 labels=np.array(self.labels, dtype=str),
+                 num_features=self.num_features)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class FeatureStore:
+    """Read-only, memory-mapped view of a feature store"""
+
+    def __init__(self, path):
+        self.path = path
+        index = np.load(os.path.join(path, INDEX_FILE))
+        self.offsets = index["offsets"]
+        self.lengths = index["lengths"]
+        self.labels = index["labels"]
+        self.num_features = int(index["num_features"])
+        total_frames = int(self.lengths.sum())
+        if total_frames:
+            self.features = np.memmap(os.path.join(path, FEATURES_FILE), dtype=np.float32,
+                                      mode="r", shape=(total_frames, self.num_features))
+        else:
+            self.features = np.zeros((0, self.num_features), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, i):
+        start = self.offsets[i]
+        return self.features[start:start + self.lengths[i]]
+
+    @property
+    def max_len(self):
+        return int(self.lengths.max()) if len(self) else 0
+
+    def padded_batch(self, indices, time_steps):
+        """Zero-pad or truncate the given clips to `time_steps` frames"""
+        batch = np.zeros((len(indices), time_steps, self.num_features), dtype=np.float32)
+        for row, i in enumerate(indices):
+            clip = self[i][:time_steps]
+            batch[row, :len(clip)] = clip
+        return batch
+
+
+def build_store(results, path=STORE_DIR, num_features=NUM_FEATURES):
+    """
+    Write `ingest.iter_dataset` output to a new store at `path`.
+
+    Returns `(store, failures)` with failures as (file, error) pairs.
+    """
+    failures = []
+    with FeatureStoreWriter(path, num_features) as writer:
+        for file_path, label, features, error in results:
+            if error is not None:
+                failures.append((file_path, error))
+            else:
+                writer.append(features, label)
+    return FeatureStore(path), failures
+
+
+def fit_scaler(store, indices, time_steps, mode=SCALER_MODE, batch_size=256):
+    """Fit a scaler (see scaling.py) on the given clips one batch at a time"""
+    scaler = make_scaler(mode)
+    for start in range(0, len(indices), batch_size):
+        batch_indices = indices[start:start + batch_size]
+        if isinstance(scaler, ChannelScaler):
+            # Real frames only, so zero padding does not bias the statistics
+            scaler.partial_fit(np.concatenate([store[i] for i in batch_indices]))
+        else:
+            scaler.partial_fit(store.padded_batch(batch_indices, time_steps))
+    return scaler
+
+
+def make_tf_dataset(store, indices, label_ids, num_classes, time_steps, scaler,
+                    batch_size=32, shuffle=False, seed=42):
+    """
+    `tf.data` pipeline over `store[indices]` yielding scaled, padded batches.
+
+    `label_ids` holds the integer label of every clip in the store. Batches
+    are padded and scaled on the fly; with `shuffle` the order changes every
+    epoch but is reproducible from `seed`.
+    """
+    import tensorflow as tf
+
+    indices = np.asarray(indices)
+    rng = np.random.default_rng(seed)
+    one_hot = np.eye(num_classes, dtype=np.float32)
+
+    def generate():
+        order = rng.permutation(indices) if shuffle else indices
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch = store.padded_batch(batch_indices, time_steps)
+            yield scaler.transform(batch), one_hot[label_ids[batch_indices]]
+
+    signature = (
+        tf.TensorSpec(shape=(None, time_steps, store.num_features), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, num_classes), dtype=tf.float32),
+    )
+    num_batches = -(-len(indices) // batch_size)
+    dataset = tf.data.Dataset.from_generator(generate, output_signature=signature)
+    return dataset.apply(tf.data.experimental.assert_cardinality(num_batches)).prefetch(2)
@@ -0,0 +1,127 @@
+"""
+Telepathy execution engine - runs blocking audio/model work off the asyncio event loop
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+# ==============================
+# CONFIG
+# ==============================
+EXECUTOR_KIND = os.environ.get("TELEPATHY_EXECUTOR", "thread")  # "thread" or "process"
+NUM_WORKERS = int(os.environ.get("TELEPATHY_WORKERS", os.cpu_count() or 1))
+QUEUE_SIZE = int(os.environ.get("TELEPATHY_QUEUE_SIZE", NUM_WORKERS * 2))
+
+
+class EngineSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+class StageTimer:
+    """Collect wall-clock durations (in ms) of named pipeline stages"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (time.perf_counter() - start) * 1000
+
+    def update(self, timings):
+        self.timings.update(timings)
+
+    def server_timing(self):
+        """Format timings as a `Server-Timing` header value"""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.timings.items())
+
+
+class InferenceEngine:
+    """
+    Bounded worker pool for CPU-heavy request work.
+
+    Decoding and feature extraction run on a thread or process pool sized to
+    the cores. Model calls run on a single dedicated thread: TensorFlow already
+    parallelises one forward pass internally and Keras models are not safe to
+    call from several threads at once. At most `workers + queue_size` requests
+    are admitted; anything beyond that is rejected with `EngineSaturated`.
+    """
+
+    def __init__(self, kind=EXECUTOR_KIND, workers=NUM_WORKERS, queue_size=QUEUE_SIZE):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind!r} (expected 'thread' or 'process')")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.in_flight = 0
+        self._pool = None
+        self._model_pool = None
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_size
+
+    @property
+    def saturated(self):
+        """True when `admit` would reject a request right now"""
+        return self.in_flight >= self.capacity
+
+    @property
+    def queue_depth(self):
+        return max(0, self.in_flight - self.workers)
+
+    def start(self):
+        """Create the worker pools"""
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="telepathy-worker")
+        self._model_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telepathy-model")
+
+    def shutdown(self):
+        for pool in (self._pool, self._model_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+        self._model_pool = None
+
+    @asynccontextmanager
+    async def admit(self):
+        """Reserve a request slot or fail fast when the engine is saturated"""
+        if self.saturated:
+            raise EngineSaturated(
+                f"{self.in_flight} requests in flight (capacity {self.capacity})"
+            )
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a CPU-bound stage on the worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    async def run_local(self, fn, *args, **kwargs):
+        """
+        Run a CPU-bound stage on state that must stay in this process.
+
+        Uses the worker pool when it is a thread pool and the event loop's
+        default thread pool otherwise (process workers cannot share state).
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._pool if self.kind == "thread" else None
+        return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def run_model(self, fn, *args, **kwargs):
+        """Run a model call on the dedicated model thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._model_pool, functools.partial(fn, *args, **kwargs))
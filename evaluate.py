@@ -0,0 +1,213 @@
+"""
+Telepathy evaluation - accuracy and latency of a saved model on a labeled corpus
+
+Runs the serving backend (TELEPATHY_BACKEND) over every labeled clip with the
+same steps as `/predict`, featurizing on a process pool and running the model
+in batches, and reports
+  - accuracy, macro F1 and per-class precision / recall / F1 / support
+  - the confusion matrix (rows: true emotion, columns: predicted)
+  - latency percentiles (p50 / p90 / p95 / p99, ms) of every stage: read,
+    decode, resample, vad, features (and within it stft, mfcc, chroma,
+    contrast, tonnetz), and the model's share per clip
+  - files that failed or had no speech (left out of the metrics)
+
+Latencies are wall-clock per clip inside each worker process, so they grow
+when workers outnumber cores, and each worker's first clip includes
+librosa's JIT compilation.
+
+The JSON report (--output) has sorted keys and is meant to be diffed between
+model versions; --baseline prints the changes against an earlier report.
+--model-version evaluates a version from the model registry (see registry.py)
+instead, e.g. a candidate before or while it receives live traffic.
+
+Layouts (--layout):
+    folders   `<data>/<emotion>/*.wav`, as in sample_data/ (default)
+    ravdess   RAVDESS actor folders (`03-01-05-...wav`)
+    cremad    CREMA-D folder (`1001_DFA_ANG_XX.wav`)
+
+Usage:
+    python evaluate.py [--data sample_data] [--layout folders] [--workers 8] [--batch-size 64]
+                       [--model-version v3] [--output report.json] [--baseline old_report.json]
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
+
+from backends import load_backend
+from engine import StageTimer
+from features import check_feature_config
+from ingest import NUM_WORKERS, list_cremad, list_emotion_folders, list_ravdess
+from score_directory import BATCH_SIZE, iter_features
+
+LAYOUTS = {"folders": list_emotion_folders, "ravdess": list_ravdess, "cremad": list_cremad}
+PERCENTILES = (50, 90, 95, 99)
+
+
+def latency_summary(samples):
+    """Mean and percentiles (ms) of one stage's samples"""
+    values = np.asarray(samples, dtype=np.float64)
+    summary = {"count": len(values), "mean": round(float(values.mean()), 3)}
+    summary.update({f"p{q}": round(float(np.percentile(values, q)), 3) for q in PERCENTILES})
+    return summary
+
+
+def classification_summary(labels, predictions, class_names):
+    """Accuracy, macro F1, per-class metrics and the confusion matrix"""
+    precision, recall, f1, support = precision_recall_fscore_support(
+        labels, predictions, labels=class_names, zero_division=0)
+    matrix = confusion_matrix(labels, predictions, labels=class_names)
+    return {
+        "accuracy": round(float(np.mean(np.array(labels) == np.array(predictions))), 4),
+        "macro_f1": round(float(np.mean(f1)), 4),
+        "per_class": {
+            name: {"precision": round(float(p), 4), "recall": round(float(r), 4),
+                   "f1": round(float(f), 4), "support": int(s)}
+            for name, p, r, f, s in zip(class_names, precision, recall, f1, support)
+        },
+        "confusion_matrix": {"labels": list(class_names), "matrix": matrix.tolist()},
+    }
+
+
+def evaluate(backend, config, items, workers, batch_size):
+    """Predict every (file, emotion) pair; returns the report's data sections"""
+    labels_by_path = dict(items)
+    labels, predictions = [], []
+    stages = {}
+    failures, no_speech = [], []
+    pending = []
+
+    def run_batch():
+        timer = StageTimer()
+        probs = backend.predict([features for _, features in pending], timer)
+        stages.setdefault("model_per_clip", []).extend([timer.timings["model"] / len(pending)] * len(pending))
+        stages.setdefault("model_batch", []).append(timer.timings["model"])
+        for (path, _), p in zip(pending, probs):
+            labels.append(labels_by_path[path])
+            predictions.append(backend.class_names[int(np.argmax(p))])
+        pending.clear()
+
+    start = time.perf_counter()
+    audio_seconds = 0.0
+    for path, features, seconds, _, timings, error in iter_features("", [p for p, _ in items], config, workers):
+        for stage, ms in timings.items():
+            stages.setdefault(stage, []).append(ms)
+        audio_seconds += seconds
+        if error is not None:
+            failures.append({"file": path, "error": error})
+        elif features is None:
+            no_speech.append(path)
+        else:
+            pending.append((path, features))
+            if len(pending) >= batch_size:
+                run_batch()
+    if pending:
+        run_batch()
+    elapsed = time.perf_counter() - start
+
+    report = classification_summary(labels, predictions, backend.class_names) if labels else {}
+    report.update({
+        "latency_ms": {stage: latency_summary(samples) for stage, samples in stages.items()},
+        "throughput": {"elapsed_s": round(elapsed, 3), "files_per_s": round(len(items) / elapsed, 3),
+                       "audio_seconds_per_s": round(audio_seconds / elapsed, 3),
+                       "workers": workers, "batch_size": batch_size},
+        "counts": {"files": len(items), "evaluated": len(labels), "no_speech": len(no_speech),
+                   "failed": len(failures)},
+        "failures": sorted(failures, key=lambda failure: failure["file"]),
+        "no_speech": sorted(no_speech),
+    })
+    return report
+
+
+def print_report(report):
+    if "accuracy" in report:
+        print(f"\n🎯 Accuracy: {report['accuracy']:.4f}   Macro F1: {report['macro_f1']:.4f}")
+        print(f"\n{'emotion':12s} {'precision':>9s} {'recall':>8s} {'f1':>8s} {'support':>8s}")
+        for name, m in report["per_class"].items():
+            print(f"{name:12s} {m['precision']:9.3f} {m['recall']:8.3f} {m['f1']:8.3f} {m['support']:8d}")
+
+        names = report["confusion_matrix"]["labels"]
+        print("\n📊 Confusion matrix (rows: true, columns: predicted)")
+        print(" " * 12 + "".join(f"{name[:8]:>9s}" for name in names))
+        for name, row in zip(names, report["confusion_matrix"]["matrix"]):
+            print(f"{name:12s}" + "".join(f"{n:9d}" for n in row))
+
+    print(f"\n⏱️  {'stage':16s} {'mean':>9s}" + "".join(f"{'p' + str(q):>9s}" for q in PERCENTILES))
+    for stage, s in report["latency_ms"].items():
+        print(f"   {stage:16s} {s['mean']:9.1f}" + "".join(f"{s['p' + str(q)]:9.1f}" for q in PERCENTILES))
+
+    t, c = report["throughput"], report["counts"]
+    print(f"\n🚀 {c['files']} files in {t['elapsed_s']:.1f} s: {t['files_per_s']:.2f} files/s, "
+          f"{t['audio_seconds_per_s']:.1f} audio-s/s")
+    if c["no_speech"]:
+        print(f"🔇 {c['no_speech']} files without speech (not scored)")
+    if c["failed"]:
+        print(f"⚠️  {c['failed']} files failed:")
+        for failure in report["failures"][:10]:
+            print(f"   {failure['file']}: {failure['error']}")
+
+
+def print_comparison(report, baseline):
+    """Changes in accuracy, per-class recall and stage latency against an earlier report"""
+    print(f"\n🔁 Against model {baseline['model']['version']}:")
+    for key in ("accuracy", "macro_f1"):
+        if key in report and key in baseline:
+            print(f"   {key:16s} {baseline[key]:.4f} -> {report[key]:.4f} ({report[key] - baseline[key]:+.4f})")
+    for name, m in report.get("per_class", {}).items():
+        old = baseline.get("per_class", {}).get(name)
+        if old:
+            print(f"   recall {name:9s} {old['recall']:.3f} -> {m['recall']:.3f} ({m['recall'] - old['recall']:+.3f})")
+    for stage, s in report["latency_ms"].items():
+        old = baseline["latency_ms"].get(stage)
+        if old:
+            print(f"   p95 {stage:12s} {old['p95']:9.1f} -> {s['p95']:9.1f} ms ({s['p95'] - old['p95']:+.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="sample_data")
+    parser.add_argument("--layout", default="folders", choices=LAYOUTS)
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="feature extraction processes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="clips per model forward pass")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--model-version", help="registry version to evaluate (default: TELEPATHY_BACKEND's model)")
+    args = parser.parse_args()
+
+    print("🧠 Loading model...")
+    if args.model_version:
+        from registry import load_version
+        backend = load_version(args.model_version)
+    else:
+        backend = load_backend()
+    config = check_feature_config(backend.feature_config)
+    print(f"✅ {backend.name} backend, model {backend.version}")
+
+    items = LAYOUTS[args.layout](args.data, backend.class_names)
+    if not items:
+        raise SystemExit(f"❌ No labeled clips for {list(backend.class_names)} in {args.data} ({args.layout} layout)")
+    print(f"📂 {len(items)} clips from {args.data}")
+
+    report = {
+        "model": {"backend": backend.name, "version": backend.version, "registry_version": args.model_version,
+                  "feature_config": config},
+        "data": {"path": args.data, "layout": args.layout},
+        "created": datetime.now().isoformat(),
+        **evaluate(backend, config, items, args.workers, args.batch_size),
+    }
+    print_report(report)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(report, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n📁 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
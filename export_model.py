@@ -0,0 +1,128 @@
+"""
+Telepathy model export - one servable artifact with preprocessing in the graph
+
+Folds everything the API used to do around `model.predict` into a single
+TensorFlow SavedModel:
+
+    serve(frames, lengths)   every clip's (frames x features) matrix,
+                             concatenated along the frame axis, plus the
+                             frame count of each clip
+        -> probabilities     (clips x classes) softmax output
+        -> labels            predicted class name of every clip
+
+Padding/truncation to the model's time steps and the scaler's normalisation
+run inside the graph, and the class names and feature config are embedded
+(`classes()`, `feature_config()`), so serving needs no scaler.pkl,
+label_encoder.pkl or feature_config.json and no sklearn/joblib at all.
+
+Usage:
+    python export_model.py [--model model_augmented.h5] [--scaler scaler.pkl]
+                           [--labels label_encoder.pkl] [--output model_export]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+# ==============================
+# CONFIG
+# ==============================
+EXPORT_DIR = os.environ.get("TELEPATHY_MODEL_DIR", "model_export")
+
+
+def _serving_module(model, mean, scale, class_names, config):
+    """tf.Module wrapping `model` with padding, scaling and class names"""
+    import tensorflow as tf
+
+    time_steps, num_features = model.input_shape[1], model.input_shape[2]
+    mean = tf.constant(np.asarray(mean, dtype=np.float32))
+    scale = tf.constant(np.asarray(scale, dtype=np.float32))
+    names = tf.constant([str(name) for name in class_names])
+    config_json = tf.constant(json.dumps(config))
+
+    module = tf.Module()
+    module.model = model
+
+    @tf.function(input_signature=[tf.TensorSpec([None, num_features], tf.float32, name="frames"),
+                                  tf.TensorSpec([None], tf.int64, name="lengths")])
+    def serve(frames, lengths):
+        # Zero-pad / truncate every clip to the model's time steps, then scale
+        clips = tf.RaggedTensor.from_row_lengths(frames, lengths)
+        batch = clips.to_tensor(0.0, shape=[None, time_steps, num_features])
+        probabilities = module.model((batch - mean) / scale, training=False)
+        return {
+            "probabilities": probabilities,
+            "labels": tf.gather(names, tf.argmax(probabilities, axis=1)),
+        }
+
+    module.serve = serve
+    module.classes = tf.function(lambda: names, input_signature=[])
+    module.feature_config = tf.function(lambda: config_json, input_signature=[])
+    module.time_steps = tf.Variable(time_steps, trainable=False, dtype=tf.int64)
+    return module
+
+
+def load_artifacts(model_path="model_augmented.h5", scaler_path="scaler.pkl",
+                   labels_path="label_encoder.pkl", config_path="feature_config.json"):
+    """Load the training outputs: (Keras model, scaler, class names, feature config)"""
+    import joblib
+    import tensorflow as tf
+    from features import load_feature_config
+    from scaling import load_scaler
+
+    model = tf.keras.models.load_model(model_path)
+    return (model, load_scaler(scaler_path), list(joblib.load(labels_path).classes_),
+            load_feature_config(config_path))
+
+
+def export_servable(model, scaler, class_names, config, path=EXPORT_DIR):
+    """Save `model` with `scaler` (see scaling.py), class names and feature config folded in"""
+    import tensorflow as tf
+
+    mean, scale = scaler.statistics()
+    module = _serving_module(model, mean, scale, class_names, config)
+    tf.saved_model.save(module, path, signatures={"serving_default": module.serve})
+    return path
+
+
+def check_parity(path, model, scaler, time_steps, num_features, clips=8, seed=42):
+    """Max absolute probability difference between the export and the unfolded pipeline"""
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(time_steps // 2, time_steps * 3 // 2, size=clips)
+    features = [rng.normal(size=(n, num_features)).astype(np.float32) for n in lengths]
+
+    batch = np.zeros((clips, time_steps, num_features), dtype=np.float32)
+    for row, f in enumerate(features):
+        batch[row, :min(len(f), time_steps)] = f[:time_steps]
+    expected = np.asarray(model.predict_on_batch(scaler.transform(batch)))
+
+    servable = tf.saved_model.load(path)
+    outputs = servable.serve(tf.constant(np.concatenate(features)), tf.constant(lengths, dtype=tf.int64))
+    return float(np.abs(outputs["probabilities"].numpy() - expected).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the trained model as one servable SavedModel")
+    parser.add_argument("--model", default="model_augmented.h5")
+    parser.add_argument("--scaler", default="scaler.pkl")
+    parser.add_argument("--labels", default="label_encoder.pkl")
+    parser.add_argument("--feature-config", default="feature_config.json")
+    parser.add_argument("--output", default=EXPORT_DIR)
+    args = parser.parse_args()
+
+    model, scaler, class_names, config = load_artifacts(args.model, args.scaler, args.labels,
+                                                        args.feature_config)
+    export_servable(model, scaler, class_names, config, args.output)
+    print(f"✅ Exported {args.model} + {args.scaler} + {args.labels} to {args.output}")
+
+    diff = check_parity(args.output, model, scaler, model.input_shape[1], model.input_shape[2])
+    print(f"🔍 Max probability difference vs. unfolded pipeline: {diff:.2e}")
+    if diff > 1e-4:
+        raise SystemExit("❌ Exported model does not match the original pipeline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Telepathy feature cache - content-addressed on-disk store of extracted features
+
+Entries are keyed by the SHA-256 of the audio file plus the feature config
+(sample rate, duration, n_mfcc, tonnetz mode, ...) and the augmentation seed,
+and stored as float32 `.npy` files sharded by key prefix:
+
+    .feature_cache/ab/abcdef....npy
+
+Re-runs and hyperparameter sweeps load features straight from the cache;
+a changed file gets a new content hash and is re-extracted on its own.
+File hashes are remembered per (path, size, mtime) in `digests.json` so
+unchanged files are not re-read on every run.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# ==============================
+# CONFIG
+# ==============================
+CACHE_DIR = os.environ.get("TELEPATHY_FEATURE_CACHE_DIR", ".feature_cache")  # "" disables the cache
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(digest, config, augment_seed=None):
+    """Key of one file's features under one feature config"""
+    payload = json.dumps({"file": digest, "config": config, "augment_seed": augment_seed},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_rng(digest, augment_seed):
+    """Random generator seeded from the augmentation seed and the file contents"""
+    return np.random.default_rng([augment_seed, int(digest[:16], 16)])
+
+
+class FeatureCache:
+    """Load-or-extract access to the on-disk feature store"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.enabled = bool(cache_dir)
+        self.hits = 0
+        self.misses = 0
+        self._index_path = os.path.join(cache_dir, "digests.json") if self.enabled else None
+        self._digests = {}
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            if os.path.exists(self._index_path):
+                with open(self._index_path) as f:
+                    self._digests = json.load(f)
+
+    def digest(self, path):
+        """Content hash of `path`, reusing the stored one if size and mtime are unchanged"""
+        stat = os.stat(path)
+        entry = self._digests.get(os.path.abspath(path))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+        digest = file_digest(path)
+        self._digests[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npy")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None  # truncated or corrupt entry, extract again
+
+    def put(self, key, features):
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(features, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def lookup(self, path, config, augment_seed=None):
+        """
+        Return `(key, digest, hit)` for `path` without loading the entry.
+
+        With the cache disabled `key` is None and `digest` is only computed
+        when an augmentation seed needs it.
+        """
+        if not self.enabled:
+            digest = file_digest(path) if augment_seed is not None else None
+            return None, digest, False
+
+        digest = self.digest(path)
+        key = cache_key(digest, config, augment_seed)
+        hit = os.path.exists(self._entry_path(key))
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return key, digest, hit
+
+    def store(self, key, features):
+        """Store features under a key returned by `lookup` (no-op when disabled)"""
+        if key is not None:
+            self.put(key, features)
+
+    def close(self):
+        """Persist the file hash index"""
+        if not self.enabled:
+            return
+        tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._digests, f)
+        os.replace(tmp_path, self._index_path)
@@ -0,0 +1,226 @@
+"""
+Telepathy feature extraction - shared by training, prediction scripts and the API
+
+Every frame is described by 65 values:
+MFCC (40) + Chroma (12) + Spectral Contrast (7) + Tonnetz (6)
+
+The spectral front end is computed once per clip: a single complex STFT feeds
+the mel spectrogram behind the MFCCs, chroma and spectral contrast (from its
+magnitude) and the harmonic/percussive separation behind tonnetz (the HPSS
+runs on the same STFT instead of recomputing it). With the default
+`hpss_cqt` tonnetz mode the output matches the
+original four independent librosa calls
+(`mfcc(y)`, `chroma_stft(S)`, `spectral_contrast(S)`, `tonnetz(harmonic(y))`)
+to within float32 rounding, i.e. an absolute difference below 1e-5 of each
+feature's range. On the sample data it is bit-for-bit equal.
+
+Tonnetz modes (HPSS is by far the most expensive step of the pipeline):
+    hpss_cqt   HPSS on the full STFT, inverse STFT, CQT chroma (original path)
+    hpss_stft  HPSS on the low band of the reused magnitude, STFT chroma
+    chroma     tonnetz projected from the chroma already computed, no HPSS
+
+The mode used for training is saved in `feature_config.json` next to
+`scaler.pkl` and picked up from there at prediction time, as are the sample
+rate and resampler (TELEPATHY_SAMPLE_RATE, TELEPATHY_RES_TYPE) and the
+optional silence gating applied before extraction (see vad.py). The config is
+versioned; configs from before versioning load with their original settings
+(44.1 kHz, `kaiser_fast`), and `check_feature_config` rejects configs this
+build cannot reproduce.
+"""
+import json
+import os
+from contextlib import nullcontext
+from functools import lru_cache
+
+import numpy as np
+import librosa
+
+from vad import VAD_MODE, VAD_MODES
+
+# ==============================
+# CONFIG
+# ==============================
+SAMPLE_RATE = int(os.environ.get("TELEPATHY_SAMPLE_RATE", 22050))  # emotion cues sit well below 11 kHz
+DURATION = 5          # seconds
+N_MFCC = 40
+N_FFT = 2048
+HOP_LENGTH = 512
+RES_TYPE = os.environ.get("TELEPATHY_RES_TYPE", "soxr_hq")  # any librosa.resample res_type
+
+TONNETZ_MODES = ("hpss_cqt", "hpss_stft", "chroma")
+TONNETZ_MODE = os.environ.get("TELEPATHY_TONNETZ_MODE", "hpss_cqt")
+FAST_HPSS_MAX_HZ = 4000  # upper edge of the band separated in "hpss_stft" mode
+
+FEATURE_CONFIG_PATH = "feature_config.json"
+FEATURE_CONFIG_VERSION = 2
+# What configs written before versioning (version 1) used
+LEGACY_CONFIG = {"version": 1, "sample_rate": 22050 * 2, "duration": 5, "n_mfcc": 40, "n_fft": 2048,
+                 "hop_length": 512, "tonnetz_mode": "hpss_cqt", "res_type": "kaiser_fast", "vad": "off"}
+
+NUM_FEATURES = N_MFCC + 12 + 7 + 6
+
+
+@lru_cache(maxsize=8)
+def _mel_basis(sr, n_fft):
+    """Mel filterbank, built once per (sample rate, FFT size)"""
+    return librosa.filters.mel(sr=sr, n_fft=n_fft)
+
+
+def feature_config(tonnetz_mode=TONNETZ_MODE, vad=VAD_MODE, sample_rate=SAMPLE_RATE, res_type=RES_TYPE):
+    """Describe the feature pipeline so training and serving can be matched"""
+    if tonnetz_mode not in TONNETZ_MODES:
+        raise ValueError(f"Unknown tonnetz mode: {tonnetz_mode!r} (expected one of {TONNETZ_MODES})")
+    if vad not in VAD_MODES:
+        raise ValueError(f"Unknown VAD mode: {vad!r} (expected one of {VAD_MODES})")
+    return {
+        "version": FEATURE_CONFIG_VERSION,
+        "sample_rate": int(sample_rate),
+        "res_type": res_type,
+        "duration": DURATION,
+        "n_mfcc": N_MFCC,
+        "n_fft": N_FFT,
+        "hop_length": HOP_LENGTH,
+        "tonnetz_mode": tonnetz_mode,
+        "vad": vad,
+    }
+
+
+def save_feature_config(config, path=FEATURE_CONFIG_PATH):
+    with open(path, "w") as f:
+        json.dump(config, f, indent=2)
+
+
+def upgrade_feature_config(config):
+    """Fill in the settings older configs left implicit"""
+    return {**LEGACY_CONFIG, **config}
+
+
+def load_feature_config(path=FEATURE_CONFIG_PATH):
+    """Load the training feature config; artifacts without one used the legacy settings"""
+    if not os.path.exists(path):
+        return dict(LEGACY_CONFIG)
+    with open(path) as f:
+        return upgrade_feature_config(json.load(f))
+
+
+def check_feature_config(config):
+    """
+    Fail fast when this build cannot reproduce the features of `config`.
+
+    Raises ValueError for a newer config version, frame parameters other
+    than this module's, unknown modes, a res_type whose backend is not
+    installed, or a sample rate / res_type that contradicts
+    TELEPATHY_SAMPLE_RATE / TELEPATHY_RES_TYPE when those are set.
+    """
+    problems = []
+    if config["version"] > FEATURE_CONFIG_VERSION:
+        problems.append(f"version {config['version']} is newer than this build's {FEATURE_CONFIG_VERSION}")
+    for key, value in (("n_fft", N_FFT), ("hop_length", HOP_LENGTH), ("n_mfcc", N_MFCC)):
+        if config[key] != value:
+            problems.append(f"{key}={config[key]} but this build uses {value}")
+    if config["tonnetz_mode"] not in TONNETZ_MODES:
+        problems.append(f"unknown tonnetz mode {config['tonnetz_mode']!r}")
+    if config["vad"] not in VAD_MODES:
+        problems.append(f"unknown VAD mode {config['vad']!r}")
+    for key, variable in (("sample_rate", "TELEPATHY_SAMPLE_RATE"), ("res_type", "TELEPATHY_RES_TYPE")):
+        if variable in os.environ and str(config[key]) != os.environ[variable]:
+            problems.append(f"{key}={config[key]} but {variable}={os.environ[variable]}")
+    try:
+        librosa.resample(np.zeros(64, dtype=np.float32), orig_sr=2, target_sr=1, res_type=config["res_type"])
+    except Exception as e:
+        problems.append(f"res_type {config['res_type']!r} is not available "
+                        f"({type(e).__name__}: {str(e).splitlines()[0]})")
+    if problems:
+        raise ValueError("Feature config does not match this build: " + "; ".join(problems))
+    return config
+
+
+def load_audio(file_path, sample_rate=SAMPLE_RATE, duration=DURATION, res_type=RES_TYPE):
+    """Load a mono clip at the feature sample rate"""
+    audio, sr = librosa.load(file_path, res_type=res_type,
+                             duration=duration, sr=sample_rate, mono=True)
+    return audio
+
+
+def _untimed(name):
+    return nullcontext()
+
+
+def extract_features(audio, sr=SAMPLE_RATE, n_mfcc=N_MFCC, tonnetz_mode=TONNETZ_MODE, timer=None):
+    """
+    Extract a (frames x 65) feature matrix from a mono waveform
+
+    With a `timer` (engine.StageTimer) each step is timed as stft, mfcc,
+    chroma, contrast and tonnetz.
+    """
+    stage = timer.stage if timer is not None else _untimed
+
+    # Shared spectral front end
+    with stage("stft"):
+        stft = librosa.stft(audio, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        magnitude = np.abs(stft)
+
+    # MFCC from the mel power spectrogram of the shared STFT
+    with stage("mfcc"):
+        mel = _mel_basis(sr, N_FFT) @ (magnitude ** 2)
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=n_mfcc)
+
+    # Chroma and Spectral Contrast from the magnitude
+    with stage("chroma"):
+        chroma = librosa.feature.chroma_stft(S=magnitude, sr=sr)
+    with stage("contrast"):
+        spec_contrast = librosa.feature.spectral_contrast(S=magnitude, sr=sr)
+
+    # Tonnetz
+    with stage("tonnetz"):
+        tonnetz = _tonnetz(audio, sr, stft, magnitude, chroma, tonnetz_mode)
+
+    # Combine all features
+    return np.vstack([mfccs, chroma, spec_contrast, tonnetz]).T
+
+
+def featurize_bytes(contents, config, timer):
+    """
+    Decode, gate and featurize the bytes of an audio file as `config` says
+
+    Used by the API and by offline scoring, so both see the same features.
+    Returns `(features, audio_seconds, skipped_seconds)`; features are None
+    when silence gating left no speech. `timer` (engine.StageTimer) times
+    decode, resample, vad and features (with the feature steps).
+    """
+    from audio_io import read_audio, resample
+    from vad import apply_vad
+    with timer.stage("decode"):
+        audio, sr = read_audio(contents, config["duration"], config["sample_rate"])
+    with timer.stage("resample"):
+        audio = resample(audio, sr, config["sample_rate"], config["res_type"])
+    seconds = len(audio) / config["sample_rate"]
+    with timer.stage("vad"):
+        audio, skipped = apply_vad(audio, config["sample_rate"], config)
+    if not len(audio):
+        return None, seconds, skipped
+    with timer.stage("features"):
+        features = extract_features(audio, config["sample_rate"], tonnetz_mode=config["tonnetz_mode"], timer=timer)
+    return features, seconds, skipped
+
+
+def _tonnetz(audio, sr, stft, magnitude, chroma, mode):
+    """Tonnetz of the harmonic component, computed according to `mode`"""
+    if mode == "chroma":
+        return librosa.feature.tonnetz(chroma=chroma)
+
+    if mode == "hpss_stft":
+        # Separate only the band that carries pitch content; bins above it
+        # contribute little to chroma and are left out of the harmonic part.
+        max_bin = int(np.ceil(FAST_HPSS_MAX_HZ * N_FFT / sr)) + 1
+        harmonic = np.zeros_like(magnitude)
+        harmonic[:max_bin], _ = librosa.decompose.hpss(magnitude[:max_bin])
+        return librosa.feature.tonnetz(chroma=librosa.feature.chroma_stft(S=harmonic, sr=sr))
+
+    if mode == "hpss_cqt":
+        harmonic_stft, _ = librosa.decompose.hpss(stft)
+        harmonic = librosa.istft(harmonic_stft, dtype=audio.dtype,
+                                 hop_length=HOP_LENGTH, length=len(audio))
+        return librosa.feature.tonnetz(y=harmonic, sr=sr)
+
+    raise ValueError(f"Unknown tonnetz mode: {mode!r} (expected one of {TONNETZ_MODES})")
@@ -0,0 +1,152 @@
+"""
+Telepathy dataset ingestion - parallel, cached feature extraction for the training scripts
+
+`iter_dataset` runs cache misses on a process pool in chunks and yields
+features in the same order as the input list, whatever order the workers
+finish in, so memory use does not grow with the corpus. Random augmentation
+is seeded per file (augmentation seed + file content hash), not per worker,
+so results do not depend on how files were distributed. Files that fail are
+yielded with their error instead of printed.
+
+The compute function must be importable by the workers: define it at module
+level and keep the calling script's top-level code under
+`if __name__ == "__main__":` (required on platforms that spawn workers).
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from feature_cache import FeatureCache, file_rng
+
+# ==============================
+# CONFIG
+# ==============================
+NUM_WORKERS = int(os.environ.get("TELEPATHY_INGEST_WORKERS", os.cpu_count() or 1))
+CHUNK_SIZE = 8
+
+# RAVDESS emotion mapping
+RAVDESS_EMOTIONS = {
+    "01": "neutral",
+    "02": "calm",
+    "03": "happy",
+    "04": "sad",
+    "05": "angry",
+    "06": "fearful",
+    "07": "surprised"
+}
+
+# CREMA-D emotion mapping
+CREMAD_EMOTIONS = {
+    "NE": "neutral",
+    "HA": "happy",
+    "SA": "sad",
+    "AN": "angry",
+    "FE": "fearful",
+}
+
+
+# ==============================
+# CORPUS LISTING
+# ==============================
+def list_emotion_folders(data_path, emotions):
+    """List (file, emotion) pairs from a `<data>/<emotion>/*.wav` layout"""
+    items = []
+    for emotion in emotions:
+        emotion_folder = os.path.join(data_path, emotion)
+        if not os.path.isdir(emotion_folder):
+            continue
+        for file in sorted(os.listdir(emotion_folder)):
+            if file.endswith(".wav"):
+                items.append((os.path.join(emotion_folder, file), emotion))
+    return items
+
+
+def list_ravdess(ravdess_path, emotions):
+    """List (file, emotion) pairs from RAVDESS actor folders (`03-01-05-...wav`)"""
+    items = []
+    for actor_folder in sorted(os.listdir(ravdess_path)):
+        actor_folder_path = os.path.join(ravdess_path, actor_folder)
+        if not os.path.isdir(actor_folder_path):
+            continue
+        for file in sorted(os.listdir(actor_folder_path)):
+            parts = file.split("-")
+            emotion = RAVDESS_EMOTIONS.get(parts[2]) if len(parts) > 2 else None
+            if emotion in emotions:
+                items.append((os.path.join(actor_folder_path, file), emotion))
+    return items
+
+
+def list_cremad(cremad_path, emotions):
+    """List (file, emotion) pairs from the CREMA-D folder (`1001_DFA_ANG_XX.wav`)"""
+    items = []
+    for file in sorted(os.listdir(cremad_path)):
+        if not file.endswith(".wav"):
+            continue
+        parts = file.split("_")
+        emotion = CREMAD_EMOTIONS.get(parts[2]) if len(parts) > 2 else None
+        if emotion in emotions:
+            items.append((os.path.join(cremad_path, file), emotion))
+    return items
+
+
+# ==============================
+# PARALLEL EXTRACTION
+# ==============================
+def _extract_one(compute, path, digest, augment_seed):
+    """Worker entry point: returns (features, None) or (None, error message)"""
+    try:
+        rng = file_rng(digest, augment_seed) if augment_seed is not None else None
+        return np.asarray(compute(path, rng), dtype=np.float32), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def iter_dataset(items, compute, config, augment_seed=None, cache=None,
+                 workers=NUM_WORKERS, chunksize=CHUNK_SIZE):
+    """
+    Yield `(file, label, features, error)` for every (file, label) pair, in input order.
+
+    `compute(path, rng)` extracts one file on a cache miss. `rng` is seeded
+    from `augment_seed` and the file's content hash so random augmentation is
+    reproducible, or is None when no seed is given.
+
+    Exactly one of `features` and `error` is None. Cached entries are loaded
+    only when their turn comes, so memory use does not grow with the corpus.
+    """
+    cache = cache or FeatureCache()
+
+    # Cache lookups happen here; only misses go to the workers
+    plan = []
+    for path, _ in items:
+        try:
+            plan.append(cache.lookup(path, config, augment_seed) + (None,))
+        except OSError as e:
+            plan.append((None, None, False, f"{type(e).__name__}: {e}"))
+
+    pending = [(path, digest) for (path, _), (_, digest, hit, error) in zip(items, plan)
+               if not hit and error is None]
+    args = (repeat(compute), [p for p, _ in pending], [d for _, d in pending], repeat(augment_seed))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(pending) > 1 else None
+    try:
+        outputs = pool.map(_extract_one, *args, chunksize=chunksize) if pool else map(_extract_one, *args)
+        for (path, label), (key, digest, hit, error) in zip(items, plan):
+            if error is not None:
+                yield path, label, None, error
+                continue
+
+            features = cache.get(key) if hit else None
+            if features is None:
+                if hit:  # unreadable cache entry, extract it again here
+                    features, error = _extract_one(compute, path, digest, augment_seed)
+                else:
+                    features, error = next(outputs)
+                if error is None:
+                    cache.store(key, features)
+            yield path, label, features, error
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        cache.close()
+
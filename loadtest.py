@@ -0,0 +1,282 @@
+"""
+Telepathy load test - how much /predict traffic one API worker sustains
+
+Replays a seeded mix of synthetic clips (`--lengths` seconds x `--formats`)
+against `/predict` in stages of increasing load, either
+    --concurrency N ...   closed loop: N clients, each sending its next request
+                          as soon as the previous one returns
+    --rps R ...           open loop: Poisson arrivals at R requests per second
+                          (at most --max-in-flight outstanding)
+for --duration seconds per stage. Every stage reports achieved throughput,
+latency percentiles of successful requests (overall and per clip kind) and
+the error rate by status (429 = engine saturated). The saturation point is
+the first stage that misses its target rate by more than 10%, exceeds
+--max-error-rate, or breaks --slo-p95-ms.
+
+Targets:
+    in-process (default)  `api.app` through httpx's ASGI transport, with the
+                          result cache off; the load generator shares the CPU
+                          and the event loop with the server
+    --url URL             a running server, e.g. one `uvicorn api:app` worker
+                          (the accurate way to size instances; turn its result
+                          cache off with TELEPATHY_RESULT_CACHE_SIZE=0)
+
+--stub serves the in-process app with the `stub` backend (see backends.py):
+a tiny stand-in with the real input shape, so the test runs offline without
+a trained model; real decoding and feature extraction still run. The model
+registry is pointed at an empty directory, so a models/routing.json in the
+working directory does not bring the real models back.
+TELEPATHY_STUB_MODEL_MS simulates the model's forward pass.
+
+Needs `httpx`.
+
+Usage:
+    python loadtest.py --stub --concurrency 1 2 4 8 [--duration 20]
+    python loadtest.py --url http://localhost:8000 --rps 1 2 4 8 --slo-p95-ms 2000 [--output load.json]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+LENGTHS_S = (2, 5, 15)
+FORMATS = ("wav", "flac", "ogg", "mp3")
+SEED = 1234
+SAMPLE_RATE = 22050     # of the synthetic uploads; the server resamples as usual
+RATE_SHORTFALL = 0.1    # an open-loop stage achieving less than 90% of its rate is saturated
+
+
+def make_uploads(lengths, formats, seed=SEED):
+    """`[(kind, filename, bytes)]` for every clip length and format, the same for a given seed"""
+    import soundfile as sf
+    from create_sample_data import EMOTIONS, generate_emotional_audio
+
+    rng = np.random.default_rng(seed)
+    uploads = []
+    for i, length in enumerate(lengths):
+        audio = generate_emotional_audio(EMOTIONS[i % len(EMOTIONS)], length, SAMPLE_RATE, rng=rng)
+        for fmt in formats:
+            buffer = io.BytesIO()
+            sf.write(buffer, audio.astype(np.float32), SAMPLE_RATE, format=fmt.upper())
+            uploads.append((f"{length}s-{fmt}", f"clip_{length}s.{fmt}", buffer.getvalue()))
+    return uploads
+
+
+class Recorder:
+    """Outcome of every request of one stage"""
+
+    def __init__(self):
+        self.records = []  # (kind, status, latency_ms)
+        self.in_flight = 0
+        self.dropped = 0   # open loop: not sent because --max-in-flight requests were outstanding
+
+    async def send(self, client, upload):
+        """Post one clip; returns the response's Retry-After (s), if any"""
+        kind, filename, contents = upload
+        self.in_flight += 1
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            response = await client.post("/predict", files={"file": (filename, contents)})
+            status = response.status_code
+            retry_after = response.headers.get("Retry-After")
+        except Exception as e:  # connection refused, timeout, ...
+            status = type(e).__name__
+        finally:
+            self.in_flight -= 1
+        self.records.append((kind, status, (time.perf_counter() - start) * 1000))
+        return float(retry_after) if retry_after else None
+
+    def summary(self, elapsed, target_rps=None):
+        from evaluate import latency_summary
+        ok = [ms for _, status, ms in self.records if status == 200]
+        statuses = {}
+        for _, status, _ in self.records:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        by_kind = {}
+        for kind, status, ms in self.records:
+            if status == 200:
+                by_kind.setdefault(kind, []).append(ms)
+        sent = len(self.records)
+        return {
+            "sent": sent,
+            "dropped": self.dropped,
+            "ok": len(ok),
+            "statuses": statuses,
+            "error_rate": round(1 - len(ok) / sent, 4) if sent else 0.0,
+            "achieved_rps": round(len(ok) / elapsed, 3),
+            "target_rps": target_rps,
+            "elapsed_s": round(elapsed, 3),
+            "latency_ms": latency_summary(ok) if ok else None,
+            "latency_ms_by_clip": {kind: latency_summary(samples) for kind, samples in sorted(by_kind.items())},
+        }
+
+
+async def closed_loop(client, uploads, concurrency, duration, rng):
+    """
+    `concurrency` clients sending back to back for `duration` seconds.
+
+    A client told to back off (429 / 503 with Retry-After) waits as asked
+    instead of retrying at once, as a well-behaved caller would.
+    """
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            retry_after = await recorder.send(client, uploads[rng.integers(len(uploads))])
+            if retry_after:
+                await asyncio.sleep(min(retry_after, max(0.0, deadline - time.perf_counter())))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return recorder.summary(time.perf_counter() - start)
+
+
+async def open_loop(client, uploads, rps, duration, max_in_flight, rng):
+    """Poisson arrivals at `rps` for `duration` seconds, then wait for the stragglers"""
+    recorder = Recorder()
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = start
+    while True:
+        next_arrival += rng.exponential(1 / rps)
+        if next_arrival - start >= duration:
+            break
+        await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+        if recorder.in_flight >= max_in_flight:
+            recorder.dropped += 1
+            continue
+        tasks.append(asyncio.create_task(recorder.send(client, uploads[rng.integers(len(uploads))])))
+    await asyncio.gather(*tasks)
+    return recorder.summary(time.perf_counter() - start, rps)
+
+
+def saturated(stage, max_error_rate, slo_p95_ms):
+    """Reasons a stage counts as saturated (empty when it kept up)"""
+    reasons = []
+    if stage["error_rate"] > max_error_rate:
+        reasons.append(f"error rate {stage['error_rate']:.1%}")
+    if stage["dropped"]:
+        reasons.append(f"{stage['dropped']} requests not sent (in-flight limit)")
+    if stage["target_rps"] and stage["achieved_rps"] < stage["target_rps"] * (1 - RATE_SHORTFALL):
+        reasons.append(f"{stage['achieved_rps']:.2f} of {stage['target_rps']:g} req/s")
+    if slo_p95_ms and stage["latency_ms"] and stage["latency_ms"]["p95"] > slo_p95_ms:
+        reasons.append(f"p95 {stage['latency_ms']['p95']:.0f} ms over the {slo_p95_ms:g} ms SLO")
+    return reasons
+
+
+async def run(args, uploads):
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        app = None
+    else:
+        import api
+        app = api
+        await api.load_models()  # the startup event, in blocking mode
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://loadtest",
+                                   timeout=args.timeout)
+
+    rng = np.random.default_rng(SEED)
+    stages = []
+    try:
+        async with client:
+            await client.post("/predict", files={"file": uploads[0][1:]})  # warm-up
+            loads = [("concurrency", n) for n in args.concurrency or []] + [("rps", r) for r in args.rps or []]
+            for mode, load in loads:
+                print(f"⏱️  {mode} {load:g} for {args.duration:g} s...", flush=True)
+                if mode == "concurrency":
+                    stage = await closed_loop(client, uploads, int(load), args.duration, rng)
+                else:
+                    stage = await open_loop(client, uploads, load, args.duration, args.max_in_flight, rng)
+                stage.update(mode=mode, load=load, saturated=saturated(stage, args.max_error_rate, args.slo_p95_ms))
+                stages.append(stage)
+                print_stage(stage)
+    finally:
+        if app is not None:
+            await app.stop_engine()
+    return stages
+
+
+def print_stage(stage):
+    latency = stage["latency_ms"] or {}
+    statuses = ", ".join(f"{status}: {n}" for status, n in sorted(stage["statuses"].items()))
+    print(f"   {stage['achieved_rps']:7.2f} ok/s  p50 {latency.get('p50', 0):8.0f}  p95 {latency.get('p95', 0):8.0f}  "
+          f"p99 {latency.get('p99', 0):8.0f} ms  errors {stage['error_rate']:.1%}  [{statuses}]")
+    for kind, s in stage["latency_ms_by_clip"].items():
+        print(f"      {kind:12s} p50 {s['p50']:8.0f}  p95 {s['p95']:8.0f} ms  ({s['count']})")
+    if stage["saturated"]:
+        print(f"   🔥 saturated: {'; '.join(stage['saturated'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", help="load a running server instead of api.app in-process")
+    parser.add_argument("--stub", action="store_true", help="in-process app on the stub backend (no trained model)")
+    parser.add_argument("--concurrency", nargs="+", type=int, help="closed-loop stages: clients in parallel")
+    parser.add_argument("--rps", nargs="+", type=float, help="open-loop stages: requests per second")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per stage")
+    parser.add_argument("--lengths", nargs="+", type=float, default=list(LENGTHS_S), help="clip lengths (s)")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--max-in-flight", type=int, default=256, help="open-loop cap on outstanding requests")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--slo-p95-ms", type=float, help="p95 latency above which a stage is saturated")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout (s)")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+    if not args.concurrency and not args.rps:
+        args.concurrency = [1, 2, 4, 8]
+    if args.stub and args.url:
+        parser.error("--stub applies to the in-process app, not to --url")
+
+    try:
+        import httpx  # noqa: F401
+    except ImportError:
+        raise SystemExit("❌ loadtest.py needs httpx: pip install httpx")
+    # Read when api / backends are first imported, so set before anything imports them
+    if not args.url:
+        os.environ["TELEPATHY_STARTUP"] = "blocking"
+        os.environ.setdefault("TELEPATHY_RESULT_CACHE_SIZE", "0")  # replayed clips would all be cache hits
+        if args.stub:
+            os.environ["TELEPATHY_BACKEND"] = "stub"
+            os.environ["TELEPATHY_MODEL_REGISTRY"] = tempfile.mkdtemp(prefix="telepathy-loadtest-")
+
+    uploads = make_uploads(args.lengths, args.formats)
+    target = args.url or f"api.app in-process ({os.environ.get('TELEPATHY_BACKEND', 'auto')} backend)"
+    print(f"🎯 {target}: {len(uploads)} clip kinds ({', '.join(kind for kind, _, _ in uploads)})")
+
+    stages = asyncio.run(run(args, uploads))
+
+    saturation = next((stage for stage in stages if stage["saturated"]), None)
+    sustained = [stage for stage in stages if not stage["saturated"]]
+    if sustained:
+        best = max(sustained, key=lambda stage: stage["achieved_rps"])
+        print(f"\n✅ Sustained {best['achieved_rps']:.2f} req/s at {best['mode']} {best['load']:g}")
+    if saturation:
+        print(f"🔥 Saturated at {saturation['mode']} {saturation['load']:g}: {'; '.join(saturation['saturated'])}")
+
+    if args.output:
+        report = {
+            "created": datetime.now().isoformat(),
+            "target": target,
+            "settings": {"duration_s": args.duration, "lengths_s": args.lengths, "formats": args.formats,
+                         "seed": SEED, "cpu_count": os.cpu_count()},
+            "stages": stages,
+            "saturation": {"mode": saturation["mode"], "load": saturation["load"],
+                           "reasons": saturation["saturated"]} if saturation else None,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📁 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
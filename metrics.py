@@ -0,0 +1,169 @@
+"""
+Telepathy metrics - lightweight in-process histograms, counters and gauges for serving statistics
+
+Metrics are registered once by name (plus optional labels) and updated on the
+hot path with a lock and a few additions, cheap enough to leave on. `/stats`
+shows `snapshot()`; `/metrics` serves `render()` in the Prometheus text format.
+"""
+import bisect
+import threading
+
+# Bucket upper bounds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+PAYLOAD_BUCKETS_BYTES = (16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+AUDIO_BUCKETS_S = (0.5, 1, 2, 5, 10, 30, 60, 300, 1800, 3600)
+
+PREFIX = "telepathy_"  # of every name in the Prometheus output
+
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+
+def _format_labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels)
+
+
+def metric_key(name, labels=None):
+    """Registry key: the name, followed by `{label="value",...}` when labelled"""
+    if not labels:
+        return name
+    return f"{name}{{{_format_labels(sorted(labels.items()))}}}"
+
+
+class Histogram:
+    """Fixed-bucket histogram with a running count and sum"""
+    kind = "histogram"
+    family_suffix = ""  # appended to the name in the Prometheus output
+
+    def __init__(self, name, description, buckets, labels=None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(sorted((labels or {}).items()))
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """Return cumulative bucket counts, count, sum and mean"""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+            running += n
+            cumulative[str(bound)] = running
+        return {
+            "description": self.description,
+            "buckets": cumulative,
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+        }
+
+    def samples(self):
+        """`(suffix, labels, value)` lines of the Prometheus output"""
+        snap = self.snapshot()
+        for bound, running in snap["buckets"].items():
+            yield "_bucket", self.labels + (("le", bound),), running
+        yield "_sum", self.labels, snap["sum"]
+        yield "_count", self.labels, snap["count"]
+
+
+class Counter:
+    """Monotonic count; `fn` reads the value from elsewhere instead of `inc`"""
+    kind = "counter"
+    family_suffix = "_total"
+
+    def __init__(self, name, description, labels=None, fn=None):
+        self.name = name
+        self.description = description
+        self.labels = tuple(sorted((labels or {}).items()))
+        self.fn = fn
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self.fn() if self.fn is not None else self._value
+
+    def snapshot(self):
+        return {"description": self.description, "value": self.value}
+
+    def samples(self):
+        yield "", self.labels, self.value
+
+
+class Gauge(Counter):
+    """Current value that goes up and down; `fn` reads it at collection time"""
+    kind = "gauge"
+    family_suffix = ""
+
+    def set(self, value):
+        self._value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+def _register(cls, name, labels, *args, **kwargs):
+    key = metric_key(name, labels)
+    metric = REGISTRY.get(key)
+    if metric is None:
+        with _registry_lock:
+            metric = REGISTRY.get(key)
+            if metric is None:
+                metric = REGISTRY[key] = cls(name, *args, labels=labels, **kwargs)
+    return metric
+
+
+def histogram(name, description, buckets=LATENCY_BUCKETS_MS, labels=None):
+    """Get or create a registered histogram"""
+    return _register(Histogram, name, labels, description, buckets)
+
+
+def counter(name, description, labels=None, fn=None):
+    """Get or create a registered counter"""
+    return _register(Counter, name, labels, description, fn=fn)
+
+
+def gauge(name, description, labels=None, fn=None):
+    """Get or create a registered gauge"""
+    return _register(Gauge, name, labels, description, fn=fn)
+
+
+def snapshot(kind="histogram"):
+    """Snapshot every registered metric of one kind"""
+    return {key: metric.snapshot() for key, metric in list(REGISTRY.items()) if metric.kind == kind}
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format (version 0.0.4)"""
+    families = {}
+    for metric in list(REGISTRY.values()):
+        families.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, metrics in families.items():
+        full_name = PREFIX + name + metrics[0].family_suffix
+        lines.append(f"# HELP {full_name} {metrics[0].description}")
+        lines.append(f"# TYPE {full_name} {metrics[0].kind}")
+        for metric in metrics:
+            for suffix, labels, value in metric.samples():
+                label_text = f"{{{_format_labels(labels)}}}" if labels else ""
+                lines.append(f"{full_name}{suffix}{label_text} {value}")
+    return "\n".join(lines) + "\n"
@@ -8,10 +8,9 @@ import tensorflow as tf
 import joblib
 import sys
 import os
-
-# ------------------ Parameters ------------------
-DURATION = 5          # seconds
-SAMPLE_RATE = 22050*2 # Hz
+from scaling import load_scaler
+from features import DURATION, check_feature_config, extract_features, load_feature_config
+from vad import apply_vad
 
 # ------------------ Load model and preprocessors ------------------
 print("🧠 Loading Telepathy AI model...")
@@ -22,28 +21,24 @@ if not os.path.exists("model_augmented.h5"):
     sys.exit(1)
 
 model = tf.keras.models.load_model("model_augmented.h5")
-scaler = joblib.load("scaler.pkl")
+scaler = load_scaler("scaler.pkl")
 label_encoder = joblib.load("label_encoder.pkl")
+feature_cfg = check_feature_config(load_feature_config())
+SAMPLE_RATE = feature_cfg["sample_rate"]  # the rate the model was trained at
 
 print("✅ Model loaded successfully!")
 print(f"📊 Emotions detected: {list(label_encoder.classes_)}")
 
 # ------------------ Helper Functions ------------------
-def extract_features(audio, sr):
-    """Extract audio features"""
-    mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=40)
-    stft = np.abs(librosa.stft(audio))
-    chroma = librosa.feature.chroma_stft(S=stft, sr=sr)
-    spec_contrast = librosa.feature.spectral_contrast(S=stft, sr=sr)
-    tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(audio), sr=sr)
-    
-    features = np.vstack([mfccs, chroma, spec_contrast, tonnetz]).T
-    return features
-
 def predict_emotion(audio):
-    """Predict emotion from audio"""
+    """Predict emotion from audio; None when silence gating leaves no speech"""
+    # Drop silence if the model was trained that way
+    audio, _ = apply_vad(audio, SAMPLE_RATE, feature_cfg)
+    if not len(audio):
+        return None
+    
     # Extract features
-    features = extract_features(audio, SAMPLE_RATE)
+    features = extract_features(audio, SAMPLE_RATE, tonnetz_mode=feature_cfg["tonnetz_mode"])
     
     # Pad or truncate to match training time_steps
     time_steps = model.input_shape[1]
@@ -53,9 +48,7 @@ def predict_emotion(audio):
         features = features[:time_steps, :]
     
     # Scale features
-    features_2d = features.reshape(1, -1)
-    features_scaled_2d = scaler.transform(features_2d)
-    features_scaled = features_scaled_2d.reshape(1, time_steps, features.shape[1])
+    features_scaled = scaler.transform(features[np.newaxis])
     
     # Make prediction
     pred_probs = model.predict(features_scaled, verbose=0)
@@ -84,11 +77,16 @@ def demo_mode():
         if files:
             # Test first file
             test_file = os.path.join(emotion_dir, files[0])
-            audio, sr = librosa.load(test_file, sr=SAMPLE_RATE, duration=DURATION)
+            audio, sr = librosa.load(test_file, sr=SAMPLE_RATE, duration=DURATION,
+                                     res_type=feature_cfg["res_type"])
             
-            pred_emotion, confidence, probs = predict_emotion(audio)
+            result = predict_emotion(audio)
             
             print(f"\n  📂 File: {emotion}/{files[0]}")
+            if result is None:
+                print("  🔇 No speech detected")
+                continue
+            pred_emotion, confidence, probs = result
             print(f"  🎯 Actual: {emotion}")
             print(f"  🤖 Predicted: {pred_emotion} ({confidence:.2f}% confidence)")
             
@@ -112,7 +110,11 @@ def live_mode():
     audio = audio.flatten()
     
     # Predict
-    pred_emotion, confidence, probs = predict_emotion(audio)
+    result = predict_emotion(audio)
+    if result is None:
+        print("\n🔇 No speech detected - try speaking louder or closer to the microphone")
+        return
+    pred_emotion, confidence, probs = result
     
     print(f"\n{'='*50}")
     print(f"🎯 PREDICTED EMOTION: {pred_emotion.upper()}")
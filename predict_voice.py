@@ -1,17 +1,17 @@
 import numpy as np
 import sounddevice as sd
-import librosa
 import tensorflow as tf
 import joblib
-
-# ------------------ Parameters ------------------
-DURATION = 5          # seconds
-SAMPLE_RATE = 22050*2 # Hz
+from scaling import load_scaler
+from features import DURATION, check_feature_config, extract_features, load_feature_config
+from vad import apply_vad
 
 # ------------------ Load model and preprocessors ------------------
 model = tf.keras.models.load_model("model_augmented.h5")
-scaler = joblib.load("scaler.pkl")
+scaler = load_scaler("scaler.pkl")
 label_encoder = joblib.load("label_encoder.pkl")
+feature_cfg = check_feature_config(load_feature_config())
+SAMPLE_RATE = feature_cfg["sample_rate"]  # the rate the model was trained at
 
 # ------------------ Record audio ------------------
 print("Recording started...")
@@ -22,15 +22,13 @@ print("Recording finished!")
 # ------------------ Preprocess audio ------------------
 audio = audio.flatten()  # convert to 1D
 
-# Extract features: MFCC + Chroma + Spectral Contrast + Tonnetz
-mfccs = librosa.feature.mfcc(y=audio, sr=SAMPLE_RATE, n_mfcc=40)
-stft = np.abs(librosa.stft(audio))
-chroma = librosa.feature.chroma_stft(S=stft, sr=SAMPLE_RATE)
-spec_contrast = librosa.feature.spectral_contrast(S=stft, sr=SAMPLE_RATE)
-tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(audio), sr=SAMPLE_RATE)
+# Drop silence if the model was trained that way
+audio, _ = apply_vad(audio, SAMPLE_RATE, feature_cfg)
+if not len(audio):
+    raise SystemExit("No speech detected")
 
-# Combine features
-features = np.vstack([mfccs, chroma, spec_contrast, tonnetz]).T
+# Extract features: MFCC + Chroma + Spectral Contrast + Tonnetz
+features = extract_features(audio, SAMPLE_RATE, tonnetz_mode=feature_cfg["tonnetz_mode"])
 
 # Pad or truncate to match training time_steps
 time_steps = model.input_shape[1]
@@ -40,9 +38,7 @@ elif features.shape[0] > time_steps:
     features = features[:time_steps, :]
 
 # Scale features
-features_2d = features.reshape(1, -1)
-features_scaled_2d = scaler.transform(features_2d)
-features_scaled = features_scaled_2d.reshape(1, time_steps, features.shape[1])
+features_scaled = scaler.transform(features[np.newaxis])
 
 # ------------------ Make prediction ------------------
 pred_probs = model.predict(features_scaled)
@@ -0,0 +1,137 @@
+"""
+Telepathy request profiling - cProfile a sampled fraction of live /predict calls
+
+Off unless enabled:
+    TELEPATHY_PROFILE_RATE    fraction of uncached /predict calls to profile (0 = never)
+    TELEPATHY_PROFILE_TOKEN   a request with `X-Telepathy-Profile: <token>` is always
+                              profiled, and skips the result cache (unset = header ignored)
+
+A profiled request runs feature extraction and its own model call (outside the
+micro-batches) under cProfile, on the same worker and model threads as any
+other request. For each one, PROFILE_DIR receives
+    <id>.prof   pstats data: `python -m pstats <id>.prof`, snakeviz, ...
+    <id>.txt    the 40 slowest functions by cumulative time
+    <id>.json   the request's stage timings, upload size and result
+and only the newest TELEPATHY_PROFILE_KEEP profiles are kept.
+
+One profile runs at a time per process; a request sampled while another is
+being profiled runs unprofiled. Python 3.12+ profiles through sys.monitoring,
+which is process-wide, so this also keeps two profilers from colliding.
+"""
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+
+# ==============================
+# CONFIG
+# ==============================
+PROFILE_RATE = float(os.environ.get("TELEPATHY_PROFILE_RATE", 0))
+PROFILE_TOKEN = os.environ.get("TELEPATHY_PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("TELEPATHY_PROFILE_DIR", ".profiles")
+PROFILE_KEEP = int(os.environ.get("TELEPATHY_PROFILE_KEEP", 50))
+PROFILE_HEADER = "X-Telepathy-Profile"
+TOP_FUNCTIONS = 40
+
+_active = threading.Lock()
+
+
+class CapturedStats:
+    """Raw profile data in the shape `pstats.Stats` loads (picklable, so it survives a process pool)"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def profile_call(fn, *args, **kwargs):
+    """
+    Run `fn` under cProfile; returns `(result, CapturedStats)`.
+
+    The stats are None when another profile is already running in this
+    process (the call still runs).
+    """
+    if not _active.acquire(blocking=False):
+        return fn(*args, **kwargs), None
+    try:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profile.disable()
+        profile.create_stats()
+        return result, CapturedStats(profile.stats)
+    finally:
+        _active.release()
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes their profiles to a rotating directory"""
+
+    def __init__(self, rate=PROFILE_RATE, token=PROFILE_TOKEN, directory=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.token = token
+        self.directory = directory
+        self.keep = max(1, keep)
+        self.written = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0 or bool(self.token)
+
+    def forced(self, header):
+        """True when the request carries the admin profiling token"""
+        return bool(self.token) and header is not None and hmac.compare_digest(header.encode(), self.token.encode())
+
+    def sampled(self):
+        return self.rate > 0 and random.random() < self.rate
+
+    def save(self, captured, info):
+        """Write one request's profile, summary and info; returns the profile id (or None)"""
+        captured = [c for c in captured if c is not None]
+        if not captured:
+            return None
+        stats = pstats.Stats(captured[0])
+        for extra in captured[1:]:
+            stats.add(extra)
+
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1000):03d}-{uuid.uuid4().hex[:6]}"
+        base = os.path.join(self.directory, profile_id)
+        stats.dump_stats(base + ".prof")
+
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(base + ".txt", "w") as f:
+            f.write(text.getvalue())
+        with open(base + ".json", "w") as f:
+            json.dump({"id": profile_id, "created": time.time(), **info}, f, indent=2)
+
+        self.written += 1
+        self._rotate()
+        return profile_id
+
+    def _rotate(self):
+        """Delete the oldest profiles beyond `keep`"""
+        ids = sorted(name[:-len(".prof")] for name in os.listdir(self.directory) if name.endswith(".prof"))
+        for old in ids[:-self.keep]:
+            for suffix in (".prof", ".txt", ".json"):
+                try:
+                    os.remove(os.path.join(self.directory, old + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        return {"enabled": self.enabled, "rate": self.rate, "header": bool(self.token),
+                "directory": self.directory, "keep": self.keep, "written": self.written}
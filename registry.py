@@ -0,0 +1,290 @@
+"""
+Telepathy model registry - versioned model artifacts, hot reload and A/B routing
+
+Layout (TELEPATHY_MODEL_REGISTRY, default `models/`):
+    models/
+        routing.json        {"active": "v2", "candidate": "v3", "candidate_percent": 10}
+        v2/
+            manifest.json   backend, model file, class names, feature config,
+                            time steps and content hash of the artifacts
+            model.onnx      the artifact files, copied in by `publish`
+            model.onnx.json
+        v3/ ...
+
+A version directory is immutable once published (`publish` writes it under
+a temporary name and renames it into place). routing.json is the only thing
+that changes: the API serves its `active` version and sends
+`candidate_percent` % of requests to `candidate`, if set. When routing.json
+changes, each API worker loads and warms up any new version in the
+background while the old ones keep serving, then swaps all at once (see
+api.py: TELEPATHY_REGISTRY_POLL_S, POST /admin/reload). Without routing.json
+the API serves the files in the working directory as before.
+
+Usage:
+    python registry.py publish v3 --backend onnx [--files model.onnx model.onnx.json] [--notes "..."]
+    python registry.py list
+    python registry.py activate v3
+    python registry.py candidate v4 --percent 10
+    python registry.py candidate --clear
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+from datetime import datetime
+
+from backends import (KerasBackend, ONNX_MODEL_PATH, TFLITE_MODEL_PATH, load_backend, metadata_path)
+from export_model import EXPORT_DIR
+
+# ==============================
+# CONFIG
+# ==============================
+REGISTRY_DIR = os.environ.get("TELEPATHY_MODEL_REGISTRY", "models")
+MANIFEST = "manifest.json"
+ROUTING = "routing.json"
+
+# Files each backend is published from (the first one is the model)
+KERAS_FILES = ("model_augmented.h5", "scaler.pkl", "label_encoder.pkl", "feature_config.json")
+DEFAULT_FILES = {
+    "keras": KERAS_FILES,
+    "savedmodel": (EXPORT_DIR,),
+    "onnx": (ONNX_MODEL_PATH, metadata_path(ONNX_MODEL_PATH)),
+    "tflite": (TFLITE_MODEL_PATH, metadata_path(TFLITE_MODEL_PATH)),
+}
+
+
+def routing_path(root=REGISTRY_DIR):
+    return os.path.join(root, ROUTING)
+
+
+def uses_registry(root=REGISTRY_DIR):
+    """True when the registry has a routing file, i.e. the API should serve from it"""
+    return os.path.exists(routing_path(root))
+
+
+def read_routing(root=REGISTRY_DIR):
+    """`{"active", "candidate", "candidate_percent"}` of the registry"""
+    with open(routing_path(root)) as f:
+        routing = json.load(f)
+    if not routing.get("active"):
+        raise ValueError(f"{routing_path(root)} names no active version")
+    percent = float(routing.get("candidate_percent") or 0)
+    if not 0 <= percent <= 100:
+        raise ValueError(f"candidate_percent must be between 0 and 100, not {percent}")
+    return {"active": routing["active"], "candidate": routing.get("candidate") or None,
+            "candidate_percent": percent if routing.get("candidate") else 0.0}
+
+
+def write_routing(routing, root=REGISTRY_DIR):
+    """Replace routing.json in one step, so a watching worker never reads half a file"""
+    for version in (routing["active"], routing.get("candidate")):
+        if version is not None:
+            read_manifest(version, root)  # must exist
+    temporary = routing_path(root) + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(routing, f, indent=2)
+    os.replace(temporary, routing_path(root))
+
+
+def list_versions(root=REGISTRY_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.exists(os.path.join(root, name, MANIFEST)))
+
+
+def read_manifest(version, root=REGISTRY_DIR):
+    path = os.path.join(root, version, MANIFEST)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No model version {version!r} in {root} (no {path})")
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_version(version, root=REGISTRY_DIR):
+    """
+    Load one published version's backend.
+
+    Raises ValueError when the artifacts no longer match their manifest
+    (feature config or content hash).
+    """
+    manifest = read_manifest(version, root)
+    directory = os.path.join(root, version)
+    model_path = os.path.join(directory, manifest["model"])
+    if manifest["backend"] == "keras":
+        backend = KerasBackend(model_path, *(os.path.join(directory, name) for name in KERAS_FILES[1:]))
+    else:
+        backend = load_backend(manifest["backend"], model_path)
+    if backend.feature_config != manifest["feature_config"]:
+        raise ValueError(f"Version {version}: feature config of the artifacts differs from the manifest")
+    if backend.version != manifest["artifact_version"]:
+        raise ValueError(f"Version {version}: artifacts changed since publishing "
+                         f"({backend.version}, manifest {manifest['artifact_version']})")
+    return backend
+
+
+def publish(version, kind, paths, root=REGISTRY_DIR, notes=""):
+    """Copy a model's files into a new version directory and describe them in its manifest"""
+    if kind not in DEFAULT_FILES:
+        raise ValueError(f"Cannot publish a {kind!r} model (expected one of {sorted(DEFAULT_FILES)})")
+    if version in (ROUTING, MANIFEST) or os.sep in version or version.startswith("."):
+        raise ValueError(f"Invalid version name: {version!r}")
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Version {version} already exists; published versions are immutable")
+
+    staging = os.path.join(root, f".{version}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        for index, path in enumerate(paths):
+            name = os.path.basename(path.rstrip(os.sep))
+            if kind == "keras":
+                # Stored under the usual names, in KERAS_FILES order; a model trained
+                # before feature_config.json existed uses the legacy settings
+                name = KERAS_FILES[index]
+                if index == 3 and not os.path.exists(path):
+                    continue
+            destination = os.path.join(staging, name)
+            if os.path.isdir(path):
+                shutil.copytree(path, destination)
+            else:
+                shutil.copy2(path, destination)
+
+        # Load what was copied, so a broken artifact never gets a manifest
+        model = KERAS_FILES[0] if kind == "keras" else os.path.basename(paths[0].rstrip(os.sep))
+        if kind == "keras":
+            backend = KerasBackend(*(os.path.join(staging, name) for name in KERAS_FILES))
+        else:
+            backend = load_backend(kind, os.path.join(staging, model))
+        manifest = {
+            "version": version,
+            "backend": kind,
+            "model": model,
+            "artifact_version": backend.version,
+            "class_names": list(backend.class_names),
+            "feature_config": backend.feature_config,
+            "time_steps": int(backend.time_steps),
+            "created": datetime.now().isoformat(),
+            "notes": notes,
+        }
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+class Router:
+    """
+    Which loaded model serves each request.
+
+    `active` and `candidate` are `(version name, backend)` pairs; `pick()`
+    returns the candidate for `candidate_percent` % of calls, at random.
+    A router is never changed once built: reloading builds a new one, so a
+    request that picked a model keeps using it to the end.
+    """
+
+    def __init__(self, active, candidate=None, candidate_percent=0.0):
+        self.active = active
+        self.candidate = candidate
+        self.candidate_percent = candidate_percent if candidate is not None else 0.0
+
+    def pick(self):
+        if self.candidate is not None and random.random() * 100 < self.candidate_percent:
+            return self.candidate
+        return self.active
+
+    def loaded(self):
+        """`{version name: backend}` of every model this router serves"""
+        return dict(model for model in (self.active, self.candidate) if model is not None)
+
+    def status(self):
+        return {
+            "active": self.active[0],
+            "candidate": self.candidate[0] if self.candidate else None,
+            "candidate_percent": self.candidate_percent,
+        }
+
+
+def run_command(parser, args):
+    """Carry out one CLI command against the registry at `args.root`"""
+    routing = read_routing(args.root) if uses_registry(args.root) else None
+
+    if args.command == "publish":
+        os.makedirs(args.root, exist_ok=True)
+        manifest = publish(args.version, args.backend, args.files or list(DEFAULT_FILES[args.backend]),
+                           args.root, args.notes)
+        print(f"✅ Published {args.version}: {manifest['backend']} model {manifest['artifact_version']}, "
+              f"classes {', '.join(manifest['class_names'])}")
+        if routing is None:
+            write_routing({"active": args.version, "candidate": None, "candidate_percent": 0}, args.root)
+            print(f"🚦 {args.version} is the active version (first in {args.root})")
+
+    elif args.command == "list":
+        for version in list_versions(args.root):
+            manifest = read_manifest(version, args.root)
+            role = ""
+            if routing and version == routing["active"]:
+                role = "  ← active"
+            elif routing and version == routing["candidate"]:
+                role = f"  ← candidate ({routing['candidate_percent']:g}%)"
+            print(f"{version:16s} {manifest['backend']:10s} {manifest['artifact_version']}  "
+                  f"{manifest['created'][:19]}{role}")
+
+    elif args.command == "activate":
+        candidate = routing["candidate"] if routing and routing["candidate"] != args.version else None
+        write_routing({"active": args.version, "candidate": candidate,
+                       "candidate_percent": routing["candidate_percent"] if candidate else 0}, args.root)
+        print(f"🚦 {args.version} is now active" + (f"; {candidate} stays candidate" if candidate else ""))
+
+    elif args.command == "candidate":
+        if routing is None:
+            parser.error("publish and activate a version first")
+        if args.clear or args.version is None:
+            write_routing({**routing, "candidate": None, "candidate_percent": 0}, args.root)
+            print("🚦 No candidate; all traffic goes to " + routing["active"])
+        else:
+            if args.version == routing["active"]:
+                parser.error(f"{args.version} is the active version")
+            if not 0 < args.percent <= 100:
+                parser.error("--percent must be in (0, 100]")
+            write_routing({**routing, "candidate": args.version, "candidate_percent": args.percent}, args.root)
+            print(f"🚦 {args.percent:g}% of traffic to candidate {args.version}, the rest to {routing['active']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the versioned models the API serves")
+    parser.add_argument("--root", default=REGISTRY_DIR, help="registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish_parser = commands.add_parser("publish", help="add a new version from model files")
+    publish_parser.add_argument("version")
+    publish_parser.add_argument("--backend", required=True, choices=sorted(DEFAULT_FILES))
+    publish_parser.add_argument("--files", nargs="+", default=[],
+                                help="model files (default: the backend's usual files; "
+                                "keras: model, scaler, label encoder, feature config)")
+    publish_parser.add_argument("--notes", default="")
+
+    commands.add_parser("list", help="show versions and routing")
+
+    activate_parser = commands.add_parser("activate", help="serve a version to all traffic not sent to the candidate")
+    activate_parser.add_argument("version")
+
+    candidate_parser = commands.add_parser("candidate", help="send a share of traffic to a version")
+    candidate_parser.add_argument("version", nargs="?")
+    candidate_parser.add_argument("--percent", type=float, default=10)
+    candidate_parser.add_argument("--clear", action="store_true", help="stop routing to a candidate")
+    args = parser.parse_args()
+    if args.command == "publish" and args.backend == "keras" and len(args.files) > len(KERAS_FILES):
+        parser.error(f"keras takes at most {len(KERAS_FILES)} files: {', '.join(KERAS_FILES)}")
+    try:
+        run_command(parser, args)
+    except (ValueError, OSError) as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
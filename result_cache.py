@@ -0,0 +1,152 @@
+"""
+Telepathy result cache - skip extraction and inference for repeated uploads
+
+Results are keyed by the SHA-256 of the uploaded bytes plus the model version
+and feature config, so retries and re-runs of the same audio are answered
+from the cache, and a new model never serves an old model's results.
+
+    memory   per-process LRU with a TTL (always on unless the size is 0)
+    SQLite   optional store shared by every uvicorn worker on the host
+             (TELEPATHY_RESULT_CACHE_DB); a memory miss falls through to it
+
+Both tiers hold at most TELEPATHY_RESULT_CACHE_SIZE entries and drop entries
+older than TELEPATHY_RESULT_CACHE_TTL_S.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ==============================
+# CONFIG
+# ==============================
+CACHE_SIZE = int(os.environ.get("TELEPATHY_RESULT_CACHE_SIZE", 1024))  # entries; 0 disables the cache
+CACHE_TTL_S = float(os.environ.get("TELEPATHY_RESULT_CACHE_TTL_S", 3600))
+CACHE_DB = os.environ.get("TELEPATHY_RESULT_CACHE_DB", "")              # "" keeps the cache per process
+
+
+def result_key(contents, model_version, config):
+    """Key of one upload's result under one model and feature config"""
+    payload = json.dumps({"upload": hashlib.sha256(contents).hexdigest(), "model": model_version,
+                          "config": config}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SQLiteStore:
+    """Result table shared between processes (WAL mode, one connection per process)"""
+
+    def __init__(self, path, max_entries, ttl_s):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS results "
+                         "(key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, 0.0
+            if now - row[1] > self.ttl_s:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None, 0.0
+            self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, value, created):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(value), created, created))
+            self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_s,))
+            # Least recently used beyond the size limit
+            self._db.execute("DELETE FROM results WHERE key IN (SELECT key FROM results "
+                             "ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+
+    def close(self):
+        self._db.close()
+
+
+class ResultCache:
+    """LRU / TTL cache of JSON-serialisable results, optionally backed by SQLite"""
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl_s=CACHE_TTL_S, db_path=CACHE_DB):
+        self.max_entries = max(0, max_entries)
+        self.ttl_s = ttl_s
+        self.enabled = self.max_entries > 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (created, value), least recently used first
+        self._lock = threading.Lock()
+        self.shared = SQLiteStore(db_path, self.max_entries, ttl_s) if self.enabled and db_path else None
+
+    def get(self, key):
+        """Cached result for `key`, or None (counts a hit or a miss)"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        value = None
+        if self.shared is not None:
+            value, created = self.shared.get(key)
+            if value is not None:
+                self._remember(key, value, created)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        created = time.time()
+        self._remember(key, value, created)
+        if self.shared is not None:
+            self.shared.put(key, value, created)
+
+    def _remember(self, key, value, created):
+        with self._lock:
+            self._entries[key] = (created, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared is not None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,149 @@
+"""
+Telepathy feature scaling - per-channel normalisation and legacy scaler migration
+
+Two scaler modes are supported, both exposing `transform(batch)` on
+(clips x frames x features) arrays:
+
+    channel  one mean/std per feature channel (65 values each), applied as a
+             NumPy broadcast; independent of clip length (default)
+    flat     the original StandardScaler over flattened (frames x features)
+             vectors, kept for existing `scaler.pkl` artifacts
+
+`load_scaler` accepts both, so models trained before per-channel scaling keep
+working unchanged. `python scaling.py convert OLD NEW` turns a flat scaler into
+an approximately equivalent channel scaler (pooled over time) for retraining;
+a model trained on the flat scaler should be re-evaluated before serving with
+a converted one.
+"""
+import os
+import sys
+
+import joblib
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from features import NUM_FEATURES
+
+# ==============================
+# CONFIG
+# ==============================
+SCALER_MODES = ("channel", "flat")
+SCALER_MODE = os.environ.get("TELEPATHY_SCALER_MODE", "channel")
+
+
+class ChannelScaler:
+    """Standardise every feature channel with statistics shared across frames"""
+
+    def __init__(self, num_features=NUM_FEATURES):
+        self.num_features = num_features
+        self.n_samples_seen_ = 0
+        self.mean_ = np.zeros(num_features)
+        self.var_ = np.zeros(num_features)
+        self.scale_ = np.ones(num_features)
+
+    def partial_fit(self, frames):
+        """Update statistics from any (..., features) array of real frames"""
+        frames = np.asarray(frames, dtype=np.float64).reshape(-1, self.num_features)
+        if not len(frames):
+            return self
+        # Chan et al. parallel update of mean and variance
+        count = len(frames)
+        mean = frames.mean(axis=0)
+        var = frames.var(axis=0)
+        total = self.n_samples_seen_ + count
+        delta = mean - self.mean_
+        self.var_ = (self.n_samples_seen_ * self.var_ + count * var
+                     + delta ** 2 * self.n_samples_seen_ * count / total) / total
+        self.mean_ = self.mean_ + delta * count / total
+        self.n_samples_seen_ = total
+        std = np.sqrt(self.var_)
+        self.scale_ = np.where(std > 0, std, 1.0)
+        return self
+
+    def transform(self, batch):
+        return ((np.asarray(batch) - self.mean_) / self.scale_).astype(np.float32)
+
+    def statistics(self):
+        """(mean, scale) arrays that broadcast over (clips x frames x features)"""
+        return self.mean_, self.scale_
+
+    @classmethod
+    def from_flat(cls, scaler, num_features=NUM_FEATURES):
+        """Pool a flattened StandardScaler's per-position statistics over time"""
+        means = scaler.mean_.reshape(-1, num_features)
+        variances = scaler.var_.reshape(-1, num_features)
+        channel = cls(num_features)
+        channel.n_samples_seen_ = int(np.max(scaler.n_samples_seen_)) * means.shape[0]
+        channel.mean_ = means.mean(axis=0)
+        channel.var_ = (variances + means ** 2).mean(axis=0) - channel.mean_ ** 2
+        std = np.sqrt(np.maximum(channel.var_, 0))
+        channel.scale_ = np.where(std > 0, std, 1.0)
+        return channel
+
+
+class FlatScaler:
+    """Adapter giving a flattened StandardScaler the 3-D `transform` interface"""
+
+    def __init__(self, scaler=None):
+        self.scaler = scaler or StandardScaler()
+
+    @property
+    def time_steps(self):
+        return self.scaler.n_features_in_ // NUM_FEATURES
+
+    def partial_fit(self, batch):
+        """Update statistics from a padded (clips x time_steps x features) batch"""
+        batch = np.asarray(batch)
+        self.scaler.partial_fit(batch.reshape(len(batch), -1))
+        return self
+
+    def transform(self, batch):
+        batch = np.asarray(batch)
+        return self.scaler.transform(batch.reshape(len(batch), -1)).reshape(batch.shape).astype(np.float32)
+
+    def statistics(self):
+        """(mean, scale) arrays of shape (time_steps x features)"""
+        return (self.scaler.mean_.reshape(-1, NUM_FEATURES),
+                self.scaler.scale_.reshape(-1, NUM_FEATURES))
+
+
+def make_scaler(mode=SCALER_MODE):
+    if mode not in SCALER_MODES:
+        raise ValueError(f"Unknown scaler mode: {mode!r} (expected one of {SCALER_MODES})")
+    return ChannelScaler() if mode == "channel" else FlatScaler()
+
+
+def load_scaler(path="scaler.pkl"):
+    """Load a channel scaler or a legacy flattened StandardScaler"""
+    scaler = joblib.load(path)
+    if isinstance(scaler, StandardScaler):
+        return FlatScaler(scaler)
+    return scaler
+
+
+def save_scaler(scaler, path="scaler.pkl"):
+    """Save a scaler; flat scalers keep the original StandardScaler format"""
+    joblib.dump(scaler.scaler if isinstance(scaler, FlatScaler) else scaler, path)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] != "convert":
+        print("Usage: python scaling.py convert OLD_SCALER.pkl NEW_SCALER.pkl")
+        sys.exit(1)
+
+    scaler = load_scaler(sys.argv[2])
+    if not isinstance(scaler, FlatScaler):
+        print(f"✅ {sys.argv[2]} is already a channel scaler")
+        return
+    channel = ChannelScaler.from_flat(scaler.scaler)
+    save_scaler(channel, sys.argv[3])
+    print(f"✅ Converted {scaler.time_steps}x{NUM_FEATURES} flat scaler to "
+          f"{NUM_FEATURES}-channel scaler: {sys.argv[3]}")
+    print("⚠️  Re-evaluate models trained on the flat scaler before serving with the converted one")
+
+
+if __name__ == "__main__":
+    # Run from the importable module, so pickled scalers refer to
+    # scaling.ChannelScaler rather than __main__.ChannelScaler
+    import scaling
+    scaling.main()
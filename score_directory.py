@@ -0,0 +1,337 @@
+"""
+Telepathy bulk scoring - classify every audio file under a directory tree
+
+Same steps as the API's `/predict` (decode, resample, silence gating, feature
+extraction, model) with the backend chosen by TELEPATHY_BACKEND:
+    - files are decoded and featurized on a process pool
+    - the model runs once per --batch-size featurized files
+    - one row per file goes to CSV, JSONL or Parquet (from the output's extension)
+
+Rows are written after every model batch, and a run skips files already in
+the output, so an interrupted run picks up where it stopped. Parquet output
+(needs `pyarrow`) is a directory of part files, one every PARQUET_PART_ROWS
+rows and one at exit; read it with `pandas.read_parquet(dir)`.
+Throughput (files/s, audio seconds/s) is printed as the run goes.
+
+Usage:
+    python score_directory.py ARCHIVE_DIR --output scores.csv [--workers 8] [--batch-size 64]
+                              [--overwrite]
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+from backends import load_backend
+from engine import StageTimer
+from features import check_feature_config, featurize_bytes
+from ingest import NUM_WORKERS
+
+# ==============================
+# CONFIG
+# ==============================
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".opus", ".mp3", ".aiff", ".aif", ".m4a", ".mp4", ".aac", ".webm")
+BATCH_SIZE = 64
+PROGRESS_EVERY_S = 10
+PARQUET_PART_ROWS = 10000  # rows per Parquet part file
+
+
+def list_audio_files(root):
+    """Audio files under `root`, as sorted paths relative to it"""
+    paths = []
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(AUDIO_EXTENSIONS) and not file.startswith("."):
+                paths.append(os.path.relpath(os.path.join(directory, file), root))
+    return paths
+
+
+# ==============================
+# FEATURE EXTRACTION (process pool)
+# ==============================
+def featurize_file(root, path, config):
+    """
+    Worker entry point: `(path, features, audio_seconds, skipped_seconds, timings, error)`.
+
+    Features are None for an error or when silence gating left no speech;
+    `timings` holds the milliseconds spent in each stage.
+    """
+    timer = StageTimer()
+    try:
+        with timer.stage("read"):
+            with open(os.path.join(root, path), "rb") as f:
+                contents = f.read()
+        features, seconds, skipped = featurize_bytes(contents, config, timer)
+        return path, features, seconds, skipped, timer.timings, None
+    except Exception as e:
+        return path, None, 0.0, 0.0, timer.timings, f"{type(e).__name__}: {e}"
+
+
+def iter_features(root, paths, config, workers):
+    """Yield `featurize_file` results as workers finish, at most 4 files per worker in flight"""
+    if workers <= 1:
+        for path in paths:
+            yield featurize_file(root, path, config)
+        return
+
+    paths = iter(paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = set()
+        try:
+            while True:
+                for path in islice(paths, 4 * workers - len(running)):
+                    running.add(pool.submit(featurize_file, root, path, config))
+                if not running:
+                    return
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in running:
+                future.cancel()
+
+
+# ==============================
+# OUTPUT
+# ==============================
+def drop_partial_line(path):
+    """Cut a last line left unfinished by an interrupted write, so appends start on a new line"""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+class CsvOutput:
+    """Rows appended to a CSV file"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            drop_partial_line(path)
+        self._file = open(path, "a", newline="")
+        self._writer = csv.DictWriter(self._file, columns)
+        if not exists:
+            self._writer.writeheader()
+
+    @staticmethod
+    def scored(path):
+        with open(path, newline="") as f:
+            return {row["path"] for row in csv.DictReader(f) if row.get("error") is not None}
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlOutput:
+    """One JSON object per line"""
+
+    def __init__(self, path, columns):
+        self.path = path
+        if os.path.exists(path):
+            drop_partial_line(path)
+        self._file = open(path, "a")
+
+    @staticmethod
+    def scored(path):
+        done = set()
+        with open(path) as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["path"])
+                except (ValueError, KeyError):  # line cut short by an interruption
+                    pass
+        return done
+
+    def write(self, rows):
+        self._file.writelines(json.dumps(row) + "\n" for row in rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetOutput:
+    """Directory of Parquet part files, one written every PARQUET_PART_ROWS rows"""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.columns = columns
+        self._rows = []
+        os.makedirs(path, exist_ok=True)
+        self._part = len([f for f in os.listdir(path) if f.endswith(".parquet")])
+
+    @staticmethod
+    def scored(path):
+        import pyarrow.parquet as pq
+        done = set()
+        for file in os.listdir(path):
+            if file.endswith(".parquet"):
+                done.update(pq.read_table(os.path.join(path, file), columns=["path"]).column("path").to_pylist())
+        return done
+
+    def write(self, rows):
+        self._rows += rows
+        if len(self._rows) >= PARQUET_PART_ROWS:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not self._rows:
+            return
+        table = pa.Table.from_pylist(self._rows).select(self.columns)
+        # Written under a temporary name so an interrupted write leaves no broken part
+        part = os.path.join(self.path, f"part-{self._part:05d}.parquet")
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self._part += 1
+        self._rows = []
+
+    def close(self):
+        self._flush()
+
+
+OUTPUTS = {".csv": CsvOutput, ".jsonl": JsonlOutput, ".parquet": ParquetOutput}
+
+
+def open_output(path, columns, overwrite=False):
+    """`(output, paths already scored)` for an output path; its extension picks the format"""
+    kind = OUTPUTS.get(os.path.splitext(path)[1].lower())
+    if kind is None:
+        raise SystemExit(f"❌ Unsupported output {path}: use one of {', '.join(OUTPUTS)}")
+    if overwrite and os.path.exists(path):
+        shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+    output = kind(path, columns)
+    return output, kind.scored(path)
+
+
+# ==============================
+# SCORING
+# ==============================
+class Throughput:
+    """Files and audio seconds scored per wall-clock second"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.files = 0
+        self.errors = 0
+        self.audio_seconds = 0.0
+        self._last_report = self.start
+
+    def add(self, rows):
+        self.files += len(rows)
+        self.errors += sum(1 for row in rows if row["error"])
+        self.audio_seconds += sum(row["audio_seconds"] for row in rows)
+
+    def line(self):
+        elapsed = time.perf_counter() - self.start
+        return (f"{self.files} files ({self.errors} errors) in {elapsed:.1f} s: "
+                f"{self.files / elapsed:.2f} files/s, {self.audio_seconds / elapsed:.1f} audio-s/s")
+
+    def report(self, total, force=False):
+        now = time.perf_counter()
+        if force or now - self._last_report >= PROGRESS_EVERY_S:
+            self._last_report = now
+            print(f"⏱️  {self.files}/{total} - {self.line()}", flush=True)
+
+
+def score(backend, pending):
+    """Run the model over `(path, features, seconds, skipped)` items; returns their rows"""
+    probs = backend.predict([features for _, features, _, _ in pending], StageTimer())
+    rows = []
+    for (path, _, seconds, skipped), p in zip(pending, probs):
+        row = make_row(backend, path, seconds, skipped)
+        index = int(p.argmax())
+        row.update(emotion=backend.class_names[index], confidence=float(p[index]), speech_detected=True)
+        row.update({f"prob_{name}": float(value) for name, value in zip(backend.class_names, p)})
+        rows.append(row)
+    return rows
+
+
+def make_row(backend, path, seconds, skipped, error=None):
+    """Row of a file without a prediction (no speech, or `error`)"""
+    row = {
+        "path": path,
+        "emotion": "" if error else "no_speech",
+        "confidence": 0.0,
+        "speech_detected": False,
+        "audio_seconds": round(seconds, 3),
+        "skipped_seconds": round(skipped, 3),
+        "model_version": backend.version,
+        "error": error or "",
+    }
+    row.update({f"prob_{name}": 0.0 for name in backend.class_names})
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("root", help="directory scanned recursively for audio files")
+    parser.add_argument("--output", required=True, help="results file: .csv, .jsonl or .parquet")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="feature extraction processes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="files per model forward pass")
+    parser.add_argument("--overwrite", action="store_true", help="start over instead of resuming")
+    args = parser.parse_args()
+
+    print("🧠 Loading model...")
+    backend = load_backend()
+    config = check_feature_config(backend.feature_config)
+    columns = (["path", "emotion", "confidence"] + [f"prob_{name}" for name in backend.class_names]
+               + ["speech_detected", "audio_seconds", "skipped_seconds", "model_version", "error"])
+    print(f"✅ {backend.name} backend, model {backend.version}, {config['sample_rate']} Hz")
+
+    paths = list_audio_files(args.root)
+    output, done = open_output(args.output, columns, args.overwrite)
+    todo = [path for path in paths if path not in done]
+    print(f"📂 {len(paths)} audio files under {args.root}, {len(paths) - len(todo)} already in {args.output}")
+    if not todo:
+        output.close()
+        return
+
+    stats = Throughput()
+    pending = []
+    try:
+        for path, features, seconds, skipped, _, error in iter_features(args.root, todo, config, args.workers):
+            if features is not None:
+                pending.append((path, features, seconds, skipped))
+                if len(pending) < args.batch_size:
+                    continue
+                rows, pending = score(backend, pending), []
+            else:
+                rows = [make_row(backend, path, seconds, skipped, error)]
+            output.write(rows)
+            stats.add(rows)
+            stats.report(len(todo))
+        if pending:
+            rows = score(backend, pending)
+            output.write(rows)
+            stats.add(rows)
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted - run the same command again to resume")
+        sys.exit(130)
+    finally:
+        output.close()
+
+    stats.report(len(todo), force=True)
+    print(f"📁 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Telepathy streaming features - incremental features over a sliding window of live audio
+
+`StreamingFeatures` is fed PCM chunks and produces the (frames x 65) feature
+matrix of the latest window (DURATION seconds) once per hop (0.5 s by
+default). Overlapping windows share their frames, so each hop only does the
+work for the audio that arrived since the last one:
+
+    STFT, mel power, spectral contrast   new frames only, cached per frame
+    HPSS (hpss_* tonnetz modes)          new frames plus the median filter's
+                                         context (HPSS_CONTEXT frames)
+    MFCC, chroma, tonnetz                from the cached columns of the window
+                                         (cheap, but they depend on the whole
+                                         window: dB range, tuning estimate)
+
+Frame k is centred on stream sample k * HOP_LENGTH, as in `extract_features`
+on a clip starting at the first sample of the stream. MFCC, chroma and
+contrast match batch extraction on the same window. In the hpss_* modes the
+median filter sees real neighbouring frames near the window edges where batch
+extraction reflects the clip; the harmonic part matches elsewhere, but the
+window's tuning estimate can shift slightly, and with it the tonnetz.
+`hpss_cqt` still recomputes its CQT chroma for the whole window.
+"""
+import os
+
+import numpy as np
+import librosa
+
+from features import (DURATION, FAST_HPSS_MAX_HZ, HOP_LENGTH, N_FFT, N_MFCC, SAMPLE_RATE,
+                      TONNETZ_MODE, TONNETZ_MODES, _mel_basis)
+
+# ==============================
+# CONFIG
+# ==============================
+HOP_SECONDS = float(os.environ.get("TELEPATHY_STREAM_HOP_S", 0.5))
+HPSS_KERNEL = 31                 # librosa.decompose.hpss default
+HPSS_CONTEXT = HPSS_KERNEL // 2  # frames on each side that affect one harmonic frame
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of the most recent columns, addressed by absolute position"""
+
+    def __init__(self, capacity, rows, dtype=np.float32):
+        self.capacity = capacity
+        self.total = 0  # columns written so far
+        self._data = np.zeros((rows, capacity), dtype=dtype)
+
+    @property
+    def first(self):
+        """Oldest position still held"""
+        return max(0, self.total - self.capacity)
+
+    def write(self, start, columns):
+        """Write columns at absolute positions start.., overwriting or appending"""
+        if start < self.first or start > self.total:
+            raise IndexError(f"Cannot write at {start}, holding {self.first}..{self.total}")
+        if columns.shape[1] > self.capacity:
+            start += columns.shape[1] - self.capacity
+            columns = columns[:, -self.capacity:]
+        positions = (np.arange(columns.shape[1]) + start) % self.capacity
+        self._data[:, positions] = columns
+        self.total = max(self.total, start + columns.shape[1])
+
+    def get(self, start, stop):
+        """Columns at absolute positions start..stop, oldest first"""
+        if start < self.first or stop > self.total:
+            raise IndexError(f"Cannot read {start}..{stop}, holding {self.first}..{self.total}")
+        return self._data[:, np.arange(start, stop) % self.capacity]
+
+
+class StreamingFeatures:
+    """Per-frame feature caches over a live mono stream at the feature sample rate"""
+
+    def __init__(self, sr=SAMPLE_RATE, window_s=DURATION, hop_s=HOP_SECONDS,
+                 tonnetz_mode=TONNETZ_MODE, n_mfcc=N_MFCC):
+        if tonnetz_mode not in TONNETZ_MODES:
+            raise ValueError(f"Unknown tonnetz mode: {tonnetz_mode!r} (expected one of {TONNETZ_MODES})")
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.tonnetz_mode = tonnetz_mode
+        self.window_frames = 1 + int(window_s * sr) // HOP_LENGTH
+        # Hops are whole frames so every window starts on a frame boundary
+        self.hop_samples = max(1, round(hop_s * sr / HOP_LENGTH)) * HOP_LENGTH
+        self.samples = 0  # samples received
+        self.frames = 0   # frames computed
+
+        # Samples not yet covered by a complete frame, with the stream's
+        # zero padding in front (as `librosa.stft(center=True)` does)
+        self._pending = np.zeros(N_FFT // 2, dtype=np.float32)
+        self._pending_start = -(N_FFT // 2)
+
+        capacity = self.window_frames + 2 * HPSS_CONTEXT
+        bins = 1 + N_FFT // 2
+        self._magnitude = RingBuffer(capacity, bins)
+        self._mel_power = RingBuffer(capacity, _mel_basis(sr, N_FFT).shape[0])
+        self._contrast = RingBuffer(capacity, 7)
+        self._stft = RingBuffer(capacity, bins, np.complex64) if tonnetz_mode == "hpss_cqt" else None
+        if tonnetz_mode == "hpss_cqt":
+            self._harmonic = RingBuffer(capacity, bins, np.complex64)
+        elif tonnetz_mode == "hpss_stft":
+            self._max_bin = int(np.ceil(FAST_HPSS_MAX_HZ * N_FFT / sr)) + 1
+            self._harmonic = RingBuffer(capacity, self._max_bin)
+        else:
+            self._harmonic = None
+
+    def push(self, samples):
+        """
+        Append mono samples; returns `(stream_seconds, features)` for every
+        hop boundary crossed, oldest first.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        windows = []
+        while len(samples):
+            to_boundary = self.hop_samples - self.samples % self.hop_samples
+            chunk, samples = samples[:to_boundary], samples[to_boundary:]
+            self._append(chunk)
+            if self.samples % self.hop_samples == 0 and self.frames:
+                windows.append((self.samples / self.sr, self.window_features()))
+        return windows
+
+    def _append(self, chunk):
+        self.samples += len(chunk)
+        self._pending = np.concatenate([self._pending, chunk])
+
+        # Frame k covers samples k*HOP - N_FFT/2 .. k*HOP + N_FFT/2
+        complete = (self.samples - N_FFT // 2) // HOP_LENGTH + 1
+        if complete <= self.frames:
+            return
+        start = self.frames * HOP_LENGTH - N_FFT // 2 - self._pending_start
+        stop = (complete - 1) * HOP_LENGTH + N_FFT // 2 - self._pending_start
+        stft = librosa.stft(self._pending[start:stop], n_fft=N_FFT, hop_length=HOP_LENGTH, center=False)
+        self._update_frames(stft)
+
+        # Keep only the samples the next frame still needs
+        keep_from = self.frames * HOP_LENGTH - N_FFT // 2
+        self._pending = self._pending[keep_from - self._pending_start:]
+        self._pending_start = keep_from
+
+    def _update_frames(self, stft):
+        first = self.frames
+        magnitude = np.abs(stft)
+        self._magnitude.write(first, magnitude)
+        self._mel_power.write(first, _mel_basis(self.sr, N_FFT) @ (magnitude ** 2))
+        self._contrast.write(first, librosa.feature.spectral_contrast(S=magnitude, sr=self.sr))
+        if self._stft is not None:
+            self._stft.write(first, stft.astype(np.complex64))
+        self.frames += stft.shape[1]
+
+        if self._harmonic is not None:
+            # Frames within HPSS_CONTEXT of the old end now have more right context
+            dirty = max(self._harmonic.first, first - HPSS_CONTEXT)
+            span = max(self._magnitude.first, dirty - HPSS_CONTEXT)
+            if self.tonnetz_mode == "hpss_cqt":
+                harmonic, _ = librosa.decompose.hpss(self._stft.get(span, self.frames),
+                                                     kernel_size=HPSS_KERNEL)
+            else:
+                harmonic, _ = librosa.decompose.hpss(self._magnitude.get(span, self.frames)[:self._max_bin],
+                                                     kernel_size=HPSS_KERNEL)
+            self._harmonic.write(dirty, harmonic[:, dirty - span:])
+
+    def window_features(self):
+        """(frames x 65) features of the latest window (shorter until it has filled)"""
+        stop = self.frames
+        start = max(0, stop - self.window_frames)
+        magnitude = self._magnitude.get(start, stop)
+
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(self._mel_power.get(start, stop)),
+                                     n_mfcc=self.n_mfcc)
+        chroma = librosa.feature.chroma_stft(S=magnitude, sr=self.sr)
+        spec_contrast = self._contrast.get(start, stop)
+
+        if self.tonnetz_mode == "chroma":
+            tonnetz = librosa.feature.tonnetz(chroma=chroma)
+        elif self.tonnetz_mode == "hpss_stft":
+            harmonic = np.zeros_like(magnitude)
+            harmonic[:self._max_bin] = self._harmonic.get(start, stop)
+            tonnetz = librosa.feature.tonnetz(chroma=librosa.feature.chroma_stft(S=harmonic, sr=self.sr))
+        else:
+            harmonic = librosa.istft(self._harmonic.get(start, stop), hop_length=HOP_LENGTH,
+                                     length=(stop - start - 1) * HOP_LENGTH)
+            tonnetz = librosa.feature.tonnetz(y=harmonic, sr=self.sr)[:, :stop - start]
+
+        return np.vstack([mfccs, chroma, spec_contrast, tonnetz]).T
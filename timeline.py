@@ -0,0 +1,113 @@
+"""
+Telepathy timeline - emotion over time for recordings of any length
+
+`load_audio` keeps the first DURATION seconds of a file. For a timeline the
+whole recording is decoded in fixed-size blocks (resampled on the fly to the
+feature sample rate) and sliced into overlapping windows of DURATION
+seconds, so only about one block plus one window of audio is held at a time,
+however long the recording:
+
+    iter_blocks    file -> mono blocks at the feature sample rate
+    iter_windows   blocks -> (start_s, window) every `hop_s` seconds
+    next_windows   the next `batch_size` windows, for one model pass
+
+The API extracts the windows' features on the worker pool and classifies each
+batch of windows in a single forward pass.
+"""
+import itertools
+import os
+
+import numpy as np
+
+from features import extract_features
+from vad import apply_vad
+
+# ==============================
+# CONFIG
+# ==============================
+HOP_SECONDS = float(os.environ.get("TELEPATHY_TIMELINE_HOP_S", 2.5))     # 50% overlap of 5 s windows
+BLOCK_SECONDS = float(os.environ.get("TELEPATHY_TIMELINE_BLOCK_S", 30))  # audio decoded per read
+BATCH_SIZE = int(os.environ.get("TELEPATHY_TIMELINE_BATCH_SIZE", 32))    # windows per model pass
+MIN_HOP_SECONDS = float(os.environ.get("TELEPATHY_TIMELINE_MIN_HOP_S", 0.1))    # smallest hop a request may ask for
+MAX_WINDOWS = int(os.environ.get("TELEPATHY_TIMELINE_MAX_WINDOWS", 5000))       # per request (~3.5 h at the default hop)
+
+
+class TooManyWindows(ValueError):
+    """Raised when a recording yields more than MAX_WINDOWS windows at the requested hop"""
+
+
+def iter_blocks(source, sr, block_s=BLOCK_SECONDS):
+    """Decode `source` (path or file object) to mono float32 blocks at `sr`"""
+    import soundfile as sf
+    import soxr
+
+    with sf.SoundFile(source) as f:
+        resampler = None
+        if f.samplerate != sr:
+            resampler = soxr.ResampleStream(f.samplerate, sr, 1, dtype="float32")
+        block_frames = max(1, int(block_s * f.samplerate))
+        while True:
+            block = f.read(block_frames, dtype="float32", always_2d=True).mean(axis=1)
+            last = len(block) < block_frames
+            if resampler is not None:
+                block = resampler.resample_chunk(block, last=last)
+            if len(block):
+                yield block
+            if last:
+                return
+
+
+def iter_windows(blocks, sr, window_s, hop_s=HOP_SECONDS):
+    """
+    Slice a stream of blocks into `(start_s, audio)` windows of `window_s`
+    seconds, one every `hop_s` seconds.
+
+    A last window aligned to the end of the audio covers the tail; audio
+    shorter than one window gives a single short window.
+    """
+    window = int(window_s * sr)
+    hop = max(1, int(hop_s * sr))
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0      # stream position of buffer[0]
+    next_start = 0  # stream position of the next window
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        while next_start + window <= offset + len(buffer):
+            i = next_start - offset
+            yield next_start / sr, buffer[i:i + window].copy()
+            next_start += hop
+        # Keep what the next window needs, and one window for the tail
+        keep_from = max(0, min(next_start - offset, len(buffer) - window))
+        buffer = buffer[keep_from:]
+        offset += keep_from
+
+    total = offset + len(buffer)
+    if next_start == 0:
+        if total:
+            yield 0.0, buffer
+    elif next_start - hop + window < total:
+        yield (total - window) / sr, buffer[-window:]
+
+
+def open_timeline(source, config, hop_s=HOP_SECONDS, block_s=BLOCK_SECONDS):
+    """Windows of the recording in `source`, sized for the feature config"""
+    blocks = iter_blocks(source, config["sample_rate"], block_s)
+    return iter_windows(blocks, config["sample_rate"], config["duration"], hop_s)
+
+
+def next_windows(windows, batch_size=BATCH_SIZE):
+    """Up to `batch_size` more `(start_s, audio)` windows (empty when done)"""
+    return list(itertools.islice(windows, batch_size))
+
+
+def window_features(audio, config):
+    """
+    Gated features of one window (runs on the worker pool)
+
+    Returns `(features, skipped_seconds)`; features are None when silence
+    gating (see vad.py) leaves no speech.
+    """
+    audio, skipped = apply_vad(audio, config["sample_rate"], config)
+    if not len(audio):
+        return None, skipped
+    return extract_features(audio, config["sample_rate"], tonnetz_mode=config["tonnetz_mode"]), skipped
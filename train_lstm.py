@@ -1,12 +1,18 @@
-import os
 import numpy as np
 import librosa
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from tensorflow.keras.utils import to_categorical
-from tensorflow.keras.models import Sequential
+from sklearn.preprocessing import LabelEncoder
+from tensorflow.keras.models import Sequential, load_model
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.callbacks import ModelCheckpoint
 import joblib
+from feature_cache import FeatureCache
+from ingest import list_ravdess, list_cremad, iter_dataset
+from scaling import SCALER_MODE, save_scaler
+from dataset import build_store, fit_scaler, make_tf_dataset
+from export_model import EXPORT_DIR, export_servable
+from features import (SAMPLE_RATE, load_audio, extract_features, feature_config, save_feature_config,
+                      check_feature_config)
+from vad import apply_vad
 
 # ==============================
 # CONFIG
@@ -14,167 +20,119 @@ import joblib
 RAVDESS_PATH = r"C:\dsp_project\act 1-24"
 CREMAD_PATH = r"C:\dsp_project\AudioWAV"
 
-DURATION = 5          # seconds
-SAMPLE_RATE = 22050*2
-N_MFCC = 40
+FEATURE_CONFIG = check_feature_config(feature_config())
+AUGMENT_SEED = 42     # augmentation is drawn from this seed and each file's content hash
 
 # Only common emotions across both datasets
 COMMON_EMOTIONS = ["neutral", "happy", "sad", "angry", "fearful" ]
 
-# RAVDESS emotion mapping
-RAVDESS_EMOTIONS = {
-    "01": "neutral",
-    "02": "calm",
-    "03": "happy",
-    "04": "sad",
-    "05": "angry",
-    "06": "fearful",
-    "07": "surprised"
-}
-
-# CREMA-D emotion mapping
-CREMAD_EMOTIONS = {
-    "NE": "neutral",
-    "HA": "happy",
-    "SA": "sad",
-    "AN": "angry",
-    "FE": "fearful",
-    
-}
-
-features = []
-labels = []
-
-print("Script started!")
-
 # ==============================
 # DATA AUGMENTATION FUNCTIONS
 # ==============================
-def add_noise(data):
-    noise_amp = 0.005 * np.random.uniform() * np.amax(data)
-    return data + noise_amp * np.random.normal(size=data.shape)
+def add_noise(data, rng):
+    noise_amp = 0.005 * rng.uniform() * np.amax(data)
+    return data + noise_amp * rng.normal(size=data.shape)
 
-def pitch_shift(data, sr):
-    n_steps = np.random.randint(-2, 3)  # random semitones shift
+def pitch_shift(data, sr, rng):
+    n_steps = int(rng.integers(-2, 3))  # random semitones shift
     return librosa.effects.pitch_shift(y=data, sr=sr, n_steps=n_steps)
 
-def time_stretch(data):
-    rate = np.random.uniform(0.9, 1.1)  # speed change between 90% - 110%
+def time_stretch(data, rng):
+    rate = rng.uniform(0.9, 1.1)  # speed change between 90% - 110%
     return librosa.effects.time_stretch(y=data, rate=rate)
 
 # ==============================
 # FEATURE EXTRACTION FUNCTION
 # ==============================
-def extract_features(file_path, sample_rate):
-    X, sr = librosa.load(file_path, res_type='kaiser_fast', duration=DURATION, sr=sample_rate, mono=True)
+def extract_augmented_features(file_path, rng):
+    X, _ = apply_vad(load_audio(file_path, SAMPLE_RATE), SAMPLE_RATE, FEATURE_CONFIG)
+    if not len(X):
+        raise ValueError("No speech detected")
+    sr = SAMPLE_RATE
     
     # Apply augmentation randomly
-    if np.random.rand() < 0.3:
-        X = add_noise(X)
-    if np.random.rand() < 0.3:
-        X = pitch_shift(X, sr)
-    if np.random.rand() < 0.3:
-        X = time_stretch(X)
+    if rng.random() < 0.3:
+        X = add_noise(X, rng)
+    if rng.random() < 0.3:
+        X = pitch_shift(X, sr, rng)
+    if rng.random() < 0.3:
+        X = time_stretch(X, rng)
     
-    # MFCC
-    mfccs = librosa.feature.mfcc(y=X, sr=sr, n_mfcc=N_MFCC)
-    # Chroma
-    stft = np.abs(librosa.stft(X))
-    chroma = librosa.feature.chroma_stft(S=stft, sr=sr)
-    # Spectral Contrast
-    spec_contrast = librosa.feature.spectral_contrast(S=stft, sr=sr)
-    # Tonnetz
-    tonnetz = librosa.feature.tonnetz(y=librosa.effects.harmonic(X), sr=sr)
-    
-    # Combine all features
-    combined = np.vstack([mfccs, chroma, spec_contrast, tonnetz]).T
-    return combined
-
-# ==============================
-# FEATURE EXTRACTION: RAVDESS
-# ==============================
-for actor_folder in os.listdir(RAVDESS_PATH):
-    actor_folder_path = os.path.join(RAVDESS_PATH, actor_folder)
-    if not os.path.isdir(actor_folder_path):
-        continue
-    for file in os.listdir(actor_folder_path):
-        file_path = os.path.join(actor_folder_path, file)
-        emotion_code = file.split("-")[2]
-        emotion = RAVDESS_EMOTIONS.get(emotion_code)
-        if emotion not in COMMON_EMOTIONS:
-            continue
-        try:
-            feats = extract_features(file_path, SAMPLE_RATE)
-            features.append(feats)
-            labels.append(emotion)
-        except Exception as e:
-            print(f"Skipping RAVDESS file {file_path} due to error: {e}")
-
-# ==============================
-# FEATURE EXTRACTION: CREMA-D
-# ==============================
-for file in os.listdir(CREMAD_PATH):
-    if not file.endswith(".wav"):
-        continue
-    try:
-        emotion_code = file.split("_")[2]  # e.g., "ANG" in "1001_DFA_ANG_XX.wav"
-        emotion = CREMAD_EMOTIONS.get(emotion_code)
-        if emotion not in COMMON_EMOTIONS:
-            continue
-        file_path = os.path.join(CREMAD_PATH, file)
-        feats = extract_features(file_path, SAMPLE_RATE)
-        features.append(feats)
-        labels.append(emotion)
-    except Exception as e:
-        print(f"Skipping CREMA-D file {file_path} due to error: {e}")
-
-print("Feature extraction completed for both datasets with augmentation.")
-
-# ==============================
-# PREPROCESSING
-# ==============================
-max_len = max([f.shape[0] for f in features])
-features_padded = np.array([np.pad(f, ((0, max_len - f.shape[0]), (0,0)), mode='constant') for f in features])
-
-X = features_padded
-y = np.array(labels)
-
-if len(X) == 0 or len(y) == 0:
-    raise ValueError("No valid audio files found. Check your dataset paths and files!")
-
-# Encode labels
-le = LabelEncoder()
-y_encoded = le.fit_transform(y)
-y_categorical = to_categorical(y_encoded)
-
-# Scale features
-num_samples, time_steps, num_features = X.shape
-X_2d = X.reshape(num_samples, time_steps*num_features)
-scaler = StandardScaler()
-X_scaled_2d = scaler.fit_transform(X_2d)
-X_scaled = X_scaled_2d.reshape(num_samples, time_steps, num_features)
-
-# Save scaler & label encoder
-joblib.dump(scaler, "scaler.pkl")
-joblib.dump(le, "label_encoder.pkl")
-
-# ==============================
-# LSTM MODEL
-# ==============================
-model = Sequential()
-model.add(LSTM(128, input_shape=(X_scaled.shape[1], X_scaled.shape[2]), return_sequences=True))
-model.add(Dropout(0.3))
-model.add(LSTM(64))
-model.add(Dropout(0.3))
-model.add(Dense(y_categorical.shape[1], activation='softmax'))
-
-model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
-
-checkpoint = ModelCheckpoint("model_augmented.h5", monitor='loss', save_best_only=True, verbose=1)
-
-# ==============================
-# TRAIN
-# ==============================
-model.fit(X_scaled, y_categorical, epochs=100, batch_size=32, callbacks=[checkpoint])
-
-print("Training completed! Model saved as model_augmented.h5")
+    # MFCC + Chroma + Spectral Contrast + Tonnetz
+    return extract_features(X, sr, tonnetz_mode=FEATURE_CONFIG["tonnetz_mode"])
+
+# ==============================
+# TRAINING PIPELINE
+# ==============================
+def main():
+    print("Script started!")
+    print(f"Scaler mode: {SCALER_MODE}")
+    print(f"Silence gating: {FEATURE_CONFIG['vad']}")
+    print(f"Sample rate: {FEATURE_CONFIG['sample_rate']} Hz ({FEATURE_CONFIG['res_type']})")
+
+    # ==============================
+    # FEATURE EXTRACTION: RAVDESS + CREMA-D
+    # ==============================
+    items = list_ravdess(RAVDESS_PATH, COMMON_EMOTIONS) + list_cremad(CREMAD_PATH, COMMON_EMOTIONS)
+    cache = FeatureCache()
+    store, failures = build_store(iter_dataset(items, extract_augmented_features, FEATURE_CONFIG,
+                                               augment_seed=AUGMENT_SEED, cache=cache))
+
+    for file_path, error in failures:
+        print(f"Skipping file {file_path} due to error: {error}")
+    print("Feature extraction completed for both datasets with augmentation.")
+    print(f"Feature cache: {cache.hits} hits, {cache.misses} extracted")
+
+    # ==============================
+    # PREPROCESSING
+    # ==============================
+    if len(store) == 0:
+        raise ValueError("No valid audio files found. Check your dataset paths and files!")
+
+    # Clips are padded to the longest one, batch by batch, straight from the memory-mapped store
+    time_steps = store.max_len
+    num_features = store.num_features
+
+    # Encode labels
+    le = LabelEncoder()
+    y_encoded = le.fit_transform(store.labels)
+    num_classes = len(le.classes_)
+
+    # Scale features (fitted incrementally, applied per batch)
+    all_indices = np.arange(len(store))
+    scaler = fit_scaler(store, all_indices, time_steps)
+    train_data = make_tf_dataset(store, all_indices, y_encoded, num_classes, time_steps,
+                                 scaler, batch_size=32, shuffle=True)
+
+    # Save scaler & label encoder
+    save_scaler(scaler, "scaler.pkl")
+    joblib.dump(le, "label_encoder.pkl")
+    save_feature_config(FEATURE_CONFIG)
+
+    # ==============================
+    # LSTM MODEL
+    # ==============================
+    model = Sequential()
+    model.add(LSTM(128, input_shape=(time_steps, num_features), return_sequences=True))
+    model.add(Dropout(0.3))
+    model.add(LSTM(64))
+    model.add(Dropout(0.3))
+    model.add(Dense(num_classes, activation='softmax'))
+
+    model.compile(loss='categorical_crossentropy', optimizer='adam', metrics=['accuracy'])
+
+    checkpoint = ModelCheckpoint("model_augmented.h5", monitor='loss', save_best_only=True, verbose=1)
+
+    # ==============================
+    # TRAIN
+    # ==============================
+    model.fit(train_data, epochs=100, callbacks=[checkpoint])
+
+    print("Training completed! Model saved as model_augmented.h5")
+
+    # Servable model with the scaler and labels folded in (see export_model.py)
+    export_servable(load_model("model_augmented.h5"), scaler, le.classes_, FEATURE_CONFIG)
+    print(f"Exported servable model to {EXPORT_DIR}/")
+
+if __name__ == "__main__":
+    main()
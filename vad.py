@@ -0,0 +1,72 @@
+"""
+Telepathy voice activity gating - drop silence before feature extraction
+
+Energy gating on the feature frames (N_FFT window, HOP_LENGTH hop): a frame
+is voiced when its RMS level is within TOP_DB of the clip's loudest frame and
+above an absolute FLOOR_DB. Voiced regions are widened by MARGIN_S on each
+side and the rest of the clip is cut out before `extract_features`, so
+silence neither costs feature extraction nor reaches the model. A clip with
+less than MIN_SPEECH_S of voiced audio counts as "no speech".
+
+Gating is part of the feature config ("vad": "off" | "energy"), chosen at
+training time with TELEPATHY_VAD and applied the same way when serving.
+Energy gating removes silence and quiet background; music as loud as the
+speech is kept.
+"""
+import os
+
+import numpy as np
+
+# ==============================
+# CONFIG
+# ==============================
+VAD_MODES = ("off", "energy")
+VAD_MODE = os.environ.get("TELEPATHY_VAD", "off")
+TOP_DB = 35          # frames this far below the loudest one are silence
+FLOOR_DB = -55       # RMS level (dB re full scale) below which nothing is speech
+MARGIN_S = 0.1       # kept on each side of a voiced region
+MIN_SPEECH_S = 0.3   # less voiced audio than this is "no speech"
+FRAME_LENGTH = 2048  # features.N_FFT
+HOP_LENGTH = 512     # features.HOP_LENGTH
+
+
+def speech_mask(audio, sr, top_db=TOP_DB, floor_db=FLOOR_DB, margin_s=MARGIN_S):
+    """Boolean voiced flag per frame (frame k centred on sample k * HOP_LENGTH)"""
+    import librosa
+
+    rms = librosa.feature.rms(y=audio, frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH)[0]
+    level = librosa.amplitude_to_db(rms, ref=1.0, top_db=None)
+    voiced = (level > level.max() - top_db) & (level > floor_db)
+
+    margin = int(round(margin_s * sr / HOP_LENGTH))
+    if margin and voiced.any():
+        voiced = np.convolve(voiced, np.ones(2 * margin + 1), mode="same") > 0
+    return voiced
+
+
+def trim_silence(audio, sr, min_speech_s=MIN_SPEECH_S, **kwargs):
+    """
+    Cut unvoiced frames out of `audio`.
+
+    Returns `(speech, skipped_seconds)`; `speech` is empty when less than
+    `min_speech_s` seconds are voiced.
+    """
+    if not len(audio):
+        return audio, 0.0
+    mask = speech_mask(audio, sr, **kwargs)
+    frames = (np.arange(len(audio)) + HOP_LENGTH // 2) // HOP_LENGTH
+    keep = mask[np.minimum(frames, len(mask) - 1)]
+    speech = audio[keep]
+    if len(speech) < min_speech_s * sr:
+        speech = audio[:0]
+    return speech, (len(audio) - len(speech)) / sr
+
+
+def apply_vad(audio, sr, config):
+    """Gate `audio` as the feature config says; returns `(speech, skipped_seconds)`"""
+    mode = config.get("vad", "off")  # configs written before gating existed
+    if mode not in VAD_MODES:
+        raise ValueError(f"Unknown VAD mode: {mode!r} (expected one of {VAD_MODES})")
+    if mode == "off":
+        return audio, 0.0
+    return trim_silence(audio, sr)